@@ -2,6 +2,11 @@ CREATE DATABASE fastapi_project_db;
 
 CREATE DATABASE fastapi_project_test_db;
 
+-- Вторая база на том же сервере, чтобы локально проверять чтение с реплики
+CREATE DATABASE fastapi_project_replica_db;
+
 GRANT ALL PRIVILEGES ON DATABASE fastapi_project_db to "postgres";
 
 GRANT ALL PRIVILEGES ON DATABASE fastapi_project_test_db to "postgres";
+
+GRANT ALL PRIVILEGES ON DATABASE fastapi_project_replica_db to "postgres";
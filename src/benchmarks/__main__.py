@@ -0,0 +1,36 @@
+"""
+Бенчмарки горячих путей приложения:
+
+    python -m src.benchmarks list_endpoints  - ORM + валидация ответа против Core + orjson
+    python -m src.benchmarks jwt             - подпись и проверка JWT, кеш проверенных токенов
+    python -m src.benchmarks jwt_algorithms  - RS256 против ES256 и EdDSA
+    python -m src.benchmarks response_models - валидация по response_model против доверенного вывода
+    python -m src.benchmarks msgpack         - размер и скорость msgpack против JSON
+
+По умолчанию работают с тестовой БД (таблицы создает pytest), все тестовые данные
+откатываются в конце. Другую базу можно передать через --database-url.
+"""
+
+import argparse
+import asyncio
+
+from src.configurations.settings import settings
+
+from . import jwt_tokens, list_endpoints, msgpack_payloads, response_models
+
+BENCHMARKS = {
+    "list_endpoints": lambda args: list_endpoints.run(args.database_url),
+    "jwt": lambda args: jwt_tokens.run(),
+    "jwt_algorithms": lambda args: jwt_tokens.run_algorithms(),
+    "response_models": lambda args: response_models.run(),
+    "msgpack": lambda args: msgpack_payloads.run(),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m src.benchmarks")
+    parser.add_argument("benchmark", choices=list(BENCHMARKS))
+    parser.add_argument("--database-url", default=settings.database_test_url)
+    args = parser.parse_args()
+
+    asyncio.run(BENCHMARKS[args.benchmark](args))
@@ -0,0 +1,75 @@
+"""
+JWT на каждом запросе: прежний путь (PEM разбирается при каждом вызове, подпись
+проверяется всегда) против ключей, загруженных один раз, и кеша проверенных токенов.
+И скорость подписи и проверки для каждого поддерживаемого алгоритма.
+"""
+
+import timeit
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from src.configurations.auth import utils as auth_utils
+from src.configurations.settings import settings
+
+NUMBER = 200
+PAYLOAD = {"email": "bench@mark.com", "seller_id": 1}
+
+
+def _report(name: str, seconds: float) -> None:
+    print(f"{name:<32} {seconds / NUMBER * 1e6:10.1f} us/op")
+
+
+async def run() -> None:
+    private_pem = settings.auth_jwt.private_key_path.read_text()
+    public_pem = settings.auth_jwt.public_key_path.read_text()
+    algorithm = auth_utils.keyring.signing_key.algorithm
+    token = auth_utils.encode_jwt(PAYLOAD)
+
+    def encode_pem():
+        jwt.encode(PAYLOAD, private_pem, algorithm=algorithm)
+
+    def decode_pem():
+        jwt.decode(token, public_pem, algorithms=[algorithm])
+
+    def decode_cached():
+        auth_utils.decode_jwt_cached(token)
+
+    _report("encode, PEM on every call", timeit.timeit(encode_pem, number=NUMBER))
+    _report(
+        "encode, key loaded once",
+        timeit.timeit(lambda: auth_utils.encode_jwt(PAYLOAD), number=NUMBER),
+    )
+    _report("decode, PEM on every call", timeit.timeit(decode_pem, number=NUMBER))
+    _report(
+        "decode, key loaded once",
+        timeit.timeit(lambda: auth_utils.decode_jwt(token), number=NUMBER),
+    )
+    _report("decode, verified token cache", timeit.timeit(decode_cached, number=NUMBER))
+
+
+def _bench_algorithm(algorithm: str, private_key) -> None:
+    public_key = private_key.public_key()
+    token = jwt.encode(PAYLOAD, private_key, algorithm=algorithm)
+
+    sign = timeit.timeit(
+        lambda: jwt.encode(PAYLOAD, private_key, algorithm=algorithm), number=NUMBER
+    )
+    verify = timeit.timeit(
+        lambda: jwt.decode(token, public_key, algorithms=[algorithm]), number=NUMBER
+    )
+    print(
+        f"{algorithm:<6} sign {NUMBER / sign:8.0f} ops/s, verify {NUMBER / verify:8.0f} ops/s, "
+        f"token {len(token)} bytes"
+    )
+
+
+async def run_algorithms() -> None:
+    # Ключи генерируются на лету: сравниваем только алгоритмы, а не файлы
+    keys = {
+        "RS256": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        "ES256": ec.generate_private_key(ec.SECP256R1()),
+        "EdDSA": ed25519.Ed25519PrivateKey.generate(),
+    }
+    for algorithm, private_key in keys.items():
+        _bench_algorithm(algorithm, private_key)
@@ -0,0 +1,96 @@
+"""
+Список книг: прежний путь (ORM-объекты -> валидация response_model -> ORJSONResponse)
+против быстрого (Core-строки -> orjson), на 10k и 100k строк.
+"""
+
+import time
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.models.books import Book
+from src.models.sellers import Seller
+from src.routers.v1.utils.json_reads import load_page_json
+from src.routers.v1.utils.pagination import PageParams
+from src.schemas import ReturnedAllBooks
+
+SIZES = (10_000, 100_000)
+ROUNDS = 5
+BOOK_COLUMNS = [Book.id, Book.seller_id, Book.title, Book.author, Book.year, Book.count_pages]
+
+# Так FastAPI проверяет и сериализует ответ по response_model
+_response_adapter = TypeAdapter(ReturnedAllBooks)
+
+
+async def orm_path(session: AsyncSession, page: PageParams) -> bytes:
+    query = select(Book).order_by(Book.id).limit(page.limit + 1)
+    books = (await session.execute(query)).scalars().all()
+    session.expunge_all()  # как у отдельного запроса - без объектов в identity map
+
+    content = _response_adapter.validate_python(
+        {"books": books[: page.limit], "next_cursor": None}, from_attributes=True
+    )
+    return ORJSONResponse(_response_adapter.dump_python(content, mode="json")).body
+
+
+async def core_path(session: AsyncSession, page: PageParams) -> bytes:
+    return await load_page_json(session, "books", BOOK_COLUMNS, page)
+
+
+async def _measure(path, session: AsyncSession, page: PageParams) -> float:
+    await path(session, page)  # прогрев
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        await path(session, page)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def run(database_url: str) -> None:
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as connection:
+            async with AsyncSession(bind=connection) as session:
+                seller = Seller(
+                    first_name="Bench", second_name="Mark", email="bench@mark.com", password="-"
+                )
+                session.add(seller)
+                await session.flush()
+
+                for size in SIZES:
+                    # Добиваем таблицу до нужного размера
+                    count = await session.scalar(select(func.count(Book.id)))
+                    await session.execute(
+                        insert(Book),
+                        [
+                            {
+                                "seller_id": seller.id,
+                                "title": f"Book {i}",
+                                "author": "Robert Martin",
+                                "year": 2007,
+                                "count_pages": 104,
+                            }
+                            for i in range(count, size)
+                        ],
+                    )
+                    page = PageParams(limit=size, after=None)
+
+                    # Тот же ответ (порядок ключей может отличаться)
+                    assert orjson.loads(await orm_path(session, page)) == orjson.loads(
+                        await core_path(session, page)
+                    )
+                    orm_time = await _measure(orm_path, session, page)
+                    core_time = await _measure(core_path, session, page)
+                    print(
+                        f"{size:>7} rows: orm {orm_time * 1000:8.1f} ms, "
+                        f"core {core_time * 1000:8.1f} ms, x{orm_time / core_time:.1f}"
+                    )
+
+                # Тестовые данные не сохраняем
+                await session.rollback()
+    finally:
+        await engine.dispose()
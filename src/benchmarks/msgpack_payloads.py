@@ -0,0 +1,60 @@
+"""
+Страница каталога в JSON (orjson) против msgpack: размер тела, кодирование и разбор.
+Данные строятся в памяти в формате ReturnedAllBooks, БД не нужна.
+"""
+
+import timeit
+
+import orjson
+
+from src.routers.v1.utils.msgpack_support import msgpack
+
+NUMBER = 20
+
+
+def _page(count: int) -> dict:
+    return {
+        "books": [
+            {
+                "id": book_id,
+                "seller_id": book_id % 100,
+                "title": f"Book {book_id}",
+                "author": f"Author {book_id % 1000}",
+                "year": 1900 + book_id % 125,
+                "count_pages": 100 + book_id % 900,
+            }
+            for book_id in range(count)
+        ],
+        "next_cursor": count,
+    }
+
+
+def _bench_page(count: int) -> None:
+    page = _page(count)
+    encoded = {"json": orjson.dumps(page), "msgpack": msgpack.packb(page)}
+    assert msgpack.unpackb(encoded["msgpack"]) == orjson.loads(encoded["json"])
+
+    timings = {
+        "json": (
+            timeit.timeit(lambda: orjson.dumps(page), number=NUMBER),
+            timeit.timeit(lambda: orjson.loads(encoded["json"]), number=NUMBER),
+        ),
+        "msgpack": (
+            timeit.timeit(lambda: msgpack.packb(page), number=NUMBER),
+            timeit.timeit(lambda: msgpack.unpackb(encoded["msgpack"]), number=NUMBER),
+        ),
+    }
+    for name, (encode, decode) in timings.items():
+        print(
+            f"{count:>7} books {name:<8} {len(encoded[name]):>10} bytes, "
+            f"encode {encode / NUMBER * 1e3:7.2f} ms, decode {decode / NUMBER * 1e3:7.2f} ms"
+        )
+
+
+async def run() -> None:
+    if msgpack is None:
+        print("msgpack is not installed: pip install msgpack")
+        return
+
+    for count in (1_000, 100_000):
+        _bench_page(count)
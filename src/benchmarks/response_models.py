@@ -0,0 +1,94 @@
+"""
+Сериализация ответов ручек: валидация FastAPI по response_model + ORJSONResponse
+против доверенного вывода (поля схемы сразу в orjson, см. utils/trusted_output).
+
+Данные строятся в памяти (ORM объекты и словари, как их отдают ручки), БД не нужна.
+"""
+
+import time
+import timeit
+
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from src.main import app
+from src.models.books import Book
+from src.routers.v1.utils.trusted_output import serializer_for
+
+NUMBER = 50
+
+
+def _book(book_id: int) -> dict:
+    return {
+        "id": book_id,
+        "seller_id": 1,
+        "title": f"Book {book_id}",
+        "author": "Author",
+        "year": 2024,
+        "count_pages": 300,
+    }
+
+
+def _seller_with_books(count: int) -> dict:
+    books = [_book(book_id) for book_id in range(count)]
+    for book in books:
+        del book["seller_id"]
+    return {
+        "id": 1,
+        "first_name": "Martin",
+        "second_name": "Iden",
+        "email": "martin@iden.com",
+        "books": books,
+    }
+
+
+# (метод, путь ручки, пример ответа, как его отдает обработчик)
+CASES = [
+    ("POST", "/api/v1/nonjwt/books/", Book(**_book(1))),
+    ("GET", "/api/v1/nonjwt/sellers/{seller_id}", _seller_with_books(100)),
+    ("GET", "/api/v1/jwt/sellers/me/info", _seller_with_books(1000)),
+    (
+        "POST",
+        "/api/v1/jwt/sellers/me/books/add_bulk",
+        {"books": [_book(book_id) for book_id in range(1000)], "errors": []},
+    ),
+]
+
+
+def _route(method: str, path: str) -> APIRoute:
+    return next(
+        route
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.path == path and method in route.methods
+    )
+
+
+async def _validated(route: APIRoute, content) -> bytes:
+    # То, что делает FastAPI с объектом, который вернул обработчик
+    validated = await serialize_response(field=route.response_field, response_content=content)
+    return ORJSONResponse(validated).body
+
+
+async def _bench_route(method: str, path: str, content) -> None:
+    route = _route(method, path)
+    serialize = serializer_for(route.response_model)
+
+    validated = await _validated(route, content)
+    assert serialize(content) == validated
+
+    started = time.perf_counter()
+    for _ in range(NUMBER):
+        await _validated(route, content)
+    seconds = time.perf_counter() - started
+
+    trusted = timeit.timeit(lambda: serialize(content), number=NUMBER)
+    print(
+        f"{method:<5}{path:<40} response_model {seconds / NUMBER * 1e6:9.1f} us, "
+        f"trusted {trusted / NUMBER * 1e6:9.1f} us ({seconds / trusted:5.1f}x), "
+        f"{len(validated)} bytes"
+    )
+
+
+async def run() -> None:
+    for method, path, content in CASES:
+        await _bench_route(method, path, content)
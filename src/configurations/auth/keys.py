@@ -0,0 +1,200 @@
+"""
+Модуль с ключами для подписи и проверки JWT.
+
+Алгоритм определяется типом ключа: RSA - RS256, EC P-256 - ES256, Ed25519 - EdDSA.
+У каждого ключа есть kid (отпечаток публичного ключа по RFC 7638), он пишется
+в заголовок токена, и при проверке по нему выбирается нужный ключ.
+
+Смена ключей без рестарта:
+    1. старый public.pem переносится в папку previous (любое имя *.pem);
+    2. на место private.pem / public.pem кладется новая пара.
+В течение keys_reload_interval секунд все воркеры подхватят новые файлы: подписывают
+новым ключом, а токены, выданные старым, проверяются по ключу из previous.
+Когда старые токены больше не нужны, ключ из previous удаляется.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm, RSAAlgorithm
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["JWTKey", "Keyring", "algorithm_for_key"]
+
+# Алгоритм подписи для кривой EC ключа
+_EC_ALGORITHMS = {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}
+# Поля JWK, из которых считается отпечаток (RFC 7638)
+_THUMBPRINT_MEMBERS = {
+    "RSA": ("e", "kty", "n"),
+    "EC": ("crv", "kty", "x", "y"),
+    "OKP": ("crv", "kty", "x"),
+}
+
+
+def algorithm_for_key(public_key) -> str:
+    """
+    JWT algorithm for the type of the key
+    """
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ec.EllipticCurvePublicKey) and (
+        algorithm := _EC_ALGORITHMS.get(public_key.curve.name)
+    ):
+        return algorithm
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+
+    raise ValueError(f"Unsupported JWT key type: {type(public_key).__name__}")
+
+
+def _to_jwk(public_key) -> dict[str, Any]:
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return RSAAlgorithm.to_jwk(public_key, as_dict=True)
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        return ECAlgorithm.to_jwk(public_key, as_dict=True)
+    return OKPAlgorithm.to_jwk(public_key, as_dict=True)
+
+
+def _thumbprint(jwk: dict[str, Any]) -> str:
+    members = {name: jwk[name] for name in _THUMBPRINT_MEMBERS[jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode())
+    return base64.urlsafe_b64encode(digest.digest()).rstrip(b"=").decode()
+
+
+@dataclass(frozen=True)
+class JWTKey:
+    kid: str
+    algorithm: str
+    public_key: Any
+    private_key: Any = None
+
+    @classmethod
+    def from_public_key(cls, public_key, private_key=None) -> "JWTKey":
+        return cls(
+            kid=_thumbprint(_to_jwk(public_key)),
+            algorithm=algorithm_for_key(public_key),
+            public_key=public_key,
+            private_key=private_key,
+        )
+
+    def to_jwk(self) -> dict[str, Any]:
+        return {
+            **_to_jwk(self.public_key),
+            "kid": self.kid,
+            "alg": self.algorithm,
+            "use": "sig",
+        }
+
+
+class Keyring:
+    """
+    Signing key and all keys accepted for verification (by kid).
+
+    Key files are re-read when they change (checked at most every `reload_interval` seconds).
+    """
+
+    def __init__(
+        self,
+        private_key_path: Path,
+        public_key_path: Path,
+        previous_keys_dir: Path,
+        reload_interval: float,
+        on_reload: Callable[[], None] | None = None,
+    ) -> None:
+        self.private_key_path = private_key_path
+        self.public_key_path = public_key_path
+        self.previous_keys_dir = previous_keys_dir
+        self.reload_interval = reload_interval
+        # Например, сбросить кеш проверенных токенов: ключ, которым их проверили, мог быть удален
+        self.on_reload = on_reload
+
+        self._files: tuple = ()
+        self._checked_at = float("-inf")
+        self._signing_key: JWTKey | None = None
+        self._keys: dict[str, JWTKey] = {}
+
+    @property
+    def signing_key(self) -> JWTKey:
+        self.refresh()
+        return self._signing_key
+
+    def get(self, kid: str | None) -> JWTKey | None:
+        """
+        Verification key by kid. Tokens without kid were issued before keys got kids,
+        they are checked with the current key.
+        """
+        self.refresh()
+        if kid is None:
+            return self._signing_key
+        return self._keys.get(kid)
+
+    def jwks(self) -> dict[str, list[dict[str, Any]]]:
+        """
+        Public keys in JWKS format (current key first)
+        """
+        self.refresh()
+        return {"keys": [key.to_jwk() for key in self._keys.values()]}
+
+    def _key_files(self) -> tuple:
+        previous = (
+            sorted(self.previous_keys_dir.glob("*.pem"))
+            if self.previous_keys_dir.is_dir()
+            else []
+        )
+        return tuple(
+            (path, path.stat().st_mtime_ns)
+            for path in [self.private_key_path, self.public_key_path, *previous]
+        )
+
+    def refresh(self) -> None:
+        """
+        Reload keys if key files have changed (checked at most every `reload_interval` seconds)
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        try:
+            files = self._key_files()
+            if files == self._files:
+                return
+            self._load(files)
+        except (OSError, ValueError) as e:
+            # Файлы могут быть на середине замены - остаемся на старых ключах до следующей проверки
+            if self._signing_key is None:
+                raise
+            logger.error("JWT keys are not reloaded: %r", e)
+            return
+
+        if self.on_reload is not None:
+            self.on_reload()
+
+    def _load(self, files: tuple) -> None:
+        private_key = load_pem_private_key(self.private_key_path.read_bytes(), password=None)
+        public_key = load_pem_public_key(self.public_key_path.read_bytes())
+        if private_key.public_key() != public_key:
+            raise ValueError(
+                f"{self.private_key_path} and {self.public_key_path} are not a pair"
+            )
+
+        signing_key = JWTKey.from_public_key(public_key, private_key)
+        keys = {signing_key.kid: signing_key}
+        for path, _ in files[2:]:
+            key = JWTKey.from_public_key(load_pem_public_key(path.read_bytes()))
+            keys.setdefault(key.kid, key)
+
+        self._signing_key, self._keys, self._files = signing_key, keys, files
+        logger.info("JWT keys loaded, signing kid %s, %d keys", signing_key.kid, len(keys))
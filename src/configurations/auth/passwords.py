@@ -0,0 +1,104 @@
+"""
+Модуль с пулом потоков для bcrypt.
+
+Хеширование и проверка пароля bcrypt занимают сотни миллисекунд CPU. Вызванные
+прямо в async ручке, они на это время останавливают event loop, и все остальные
+запросы воркера ждут. Здесь bcrypt выполняется в отдельных потоках (bcrypt
+отпускает GIL), а число одновременных и ожидающих операций ограничено:
+при переполнении запрос сразу отклоняется, а не копится в очереди.
+"""
+
+import asyncio
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import bcrypt
+
+__all__ = ["PasswordHasher", "PasswordHasherBusy"]
+
+
+class PasswordHasherBusy(Exception):
+    """
+    All bcrypt workers are busy and the wait queue is full
+    """
+
+
+class PasswordHasher:
+    """
+    bcrypt in a thread pool of `workers` threads, at most `queue_size` operations wait for them
+    """
+
+    def __init__(self, workers: int, queue_size: int, rounds: int) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0  # выполняются + ждут в очереди
+        self.completed = 0
+        self.rejected = 0
+        self._dummy_hash: bytes | None = None
+
+    def hash_sync(self, password: str) -> bytes:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds))
+
+    @staticmethod
+    def verify_sync(password: str, hashed_password: bytes) -> bool:
+        return bcrypt.checkpw(password=password.encode(), hashed_password=hashed_password)
+
+    def needs_rehash(self, hashed_password: bytes) -> bool:
+        """
+        Hash was made with a cost other than the configured one
+        """
+        # Формат bcrypt: $2b$<cost>$<соль и хеш>
+        try:
+            return int(hashed_password.split(b"$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    async def hash(self, password: str) -> bytes:
+        return await self._run(self.hash_sync, password)
+
+    async def verify(self, password: str, hashed_password: bytes) -> bool:
+        return await self._run(self.verify_sync, password, hashed_password)
+
+    async def verify_unknown(self, password: str) -> bool:
+        """
+        Do the same work as `verify` for a user who does not exist, always False
+        """
+        # Хеш случайного пароля с текущим cost, считается один раз
+        if self._dummy_hash is None or self.needs_rehash(self._dummy_hash):
+            self._dummy_hash = await self.hash(secrets.token_hex(16))
+
+        await self.verify(password, self._dummy_hash)
+        return False
+
+    async def _run(self, fn: Callable, *args: Any) -> Any:
+        if self._pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(fn, *args)
+        self._pending += 1
+        # Место освобождается, когда поток закончил работу, даже если запрос уже отменен
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._done))
+
+        return await asyncio.wrap_future(future)
+
+    def _done(self) -> None:
+        self._pending -= 1
+        self.completed += 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "rounds": self.rounds,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
@@ -1,18 +1,58 @@
+import time
+
 import jwt
-import bcrypt
 
+from src.configurations.cache_backends import TTLCache
 from src.configurations.settings import settings
 
+from .keys import Keyring
+from .passwords import PasswordHasher
+
+# bcrypt в отдельных потоках, чтобы вход и регистрация не останавливали event loop
+password_hasher = PasswordHasher(
+    settings.password_hash_workers,
+    settings.password_hash_queue_size,
+    settings.bcrypt_rounds,
+)
+
+# Уже проверенные payload токенов: повторный запрос с тем же токеном не проверяет подпись.
+# Запись живет не дольше срока действия токена (exp) и payload_cache_ttl.
+_verified_payloads = TTLCache(
+    settings.auth_jwt.payload_cache_size,
+    settings.auth_jwt.payload_cache_ttl,
+)
+
+# Ключи читаются один раз и перечитываются, только если файлы изменились.
+# После смены ключей кеш проверенных токенов сбрасывается.
+keyring = Keyring(
+    settings.auth_jwt.private_key_path,
+    settings.auth_jwt.public_key_path,
+    settings.auth_jwt.previous_keys_dir,
+    settings.auth_jwt.keys_reload_interval,
+    on_reload=_verified_payloads.clear,
+)
+
 
 def encode_jwt(
     payload: dict,
-    private_key: str = settings.auth_jwt.private_key_path.read_text(),
-    algorithm: str = settings.auth_jwt.algorithm,
+    private_key=None,
+    algorithm: str | None = None,
 ):
+    """
+    Sign payload with the current key of the keyring (its kid goes to the header)
+    or with the passed key and algorithm
+    """
+    headers = None
+    if private_key is None:
+        signing_key = keyring.signing_key
+        private_key, algorithm = signing_key.private_key, signing_key.algorithm
+        headers = {"kid": signing_key.kid}
+
     encoded = jwt.encode(
         payload=payload,
         key=private_key,
         algorithm=algorithm,
+        headers=headers,
     )
 
     return encoded
@@ -20,9 +60,19 @@ def encode_jwt(
 
 def decode_jwt(
     token: str | bytes,
-    public_key: str = settings.auth_jwt.public_key_path.read_text(),
-    algorithm: str = settings.auth_jwt.algorithm,
+    public_key=None,
+    algorithm: str | None = None,
 ):
+    """
+    Verify token with the key of the keyring chosen by kid from the header
+    or with the passed key and algorithm
+    """
+    if public_key is None:
+        key = keyring.get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise jwt.InvalidTokenError("Token is signed with unknown key")
+        # Только алгоритм этого ключа: алгоритм из заголовка токена не доверяем
+        public_key, algorithm = key.public_key, key.algorithm
 
     decoded = jwt.decode(
         jwt=token,
@@ -33,20 +83,40 @@ def decode_jwt(
     return decoded
 
 
+def decode_jwt_cached(token: str) -> dict:
+    """
+    Decode token, signature of the same token is verified only once
+    while it is in the cache of verified payloads
+    """
+    keyring.refresh()  # после смены ключей кеш сбрасывается
+
+    if (payload := _verified_payloads.get(token)) is None:
+        payload = decode_jwt(token=token)
+
+        ttl = settings.auth_jwt.payload_cache_ttl
+        if (exp := payload.get("exp")) is not None:
+            ttl = min(ttl, exp - time.time())
+        if ttl > 0:
+            _verified_payloads.set(token, payload, ttl)
+
+    # Копия, чтобы изменения payload в обработчике не попали в кеш
+    return dict(payload)
+
+
 def hash_password(
     password: str,
 ) -> bytes:
-    return bcrypt.hashpw(
-        password.encode(),
-        bcrypt.gensalt(),
-    )
+    """
+    Hash password right in the calling thread (async handlers use `password_hasher.hash`)
+    """
+    return password_hasher.hash_sync(password)
 
 
 def validate_password(
     password: str,
     hashed_password: bytes,
 ) -> bool:
-    return bcrypt.checkpw(
-        password=password.encode(),
-        hashed_password=hashed_password,
-    )
+    """
+    Check password right in the calling thread (async handlers use `password_hasher.verify`)
+    """
+    return password_hasher.verify_sync(password, hashed_password)
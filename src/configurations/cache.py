@@ -0,0 +1,192 @@
+"""
+Модуль с кешем ответов ручек чтения (книги и продавцы).
+
+Хранилище выбирается в настройках (см. cache_backends): в памяти процесса
+или общий Redis для всех воркеров и подов.
+
+Инвалидация - через версии пространств имен: у каждой таблицы (модели) есть
+счетчик, он входит в ключ. Запись в таблицу увеличивает счетчик, и все
+закешированные ответы по ней (книга по id, страницы списков) становятся
+недостижимы сразу, без перебора ключей. Старые записи потом удаляются по TTL.
+
+Ответы для кеша читаются только с primary (см. `cache_fill`): реплика с лагом
+вернула бы строки до записи, и они легли бы в кеш под новой версией на весь TTL.
+"""
+
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache_backends import CacheBackend, RespError, build_cache_backend
+from .settings import settings
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "ResponseCache",
+    "cache_fill",
+    "response_cache",
+    "invalidate_cache",
+    "invalidate_pending",
+]
+
+# Ошибки недоступного хранилища: с ними ручки работают без кеша, напрямую с БД
+BACKEND_ERRORS = (OSError, EOFError, asyncio.TimeoutError, RespError)
+
+# Идет загрузка ответа, который ляжет в кеш: сессии реплик читают в это время с primary
+cache_fill: ContextVar[bool] = ContextVar("cache_fill", default=False)
+
+# Ключ в session.info с таблицами, которые надо инвалидировать еще раз после commit
+_PENDING_KEY = "cache_invalidate"
+
+
+def _namespace(model) -> str:
+    # Пространство имен - таблица модели или уже ее имя (как в session.info)
+    return model if isinstance(model, str) else model.__tablename__
+
+
+class ResponseCache:
+    """
+    Cache of serialized (JSON bytes) responses, namespaced by table
+    (a model or its table name).
+
+    Key of an entry includes current version of its table namespace,
+    so `invalidate(model)` drops all cached responses of the table at once.
+    Concurrent misses of the same entry share one load (single flight).
+    If the backend is unavailable, responses are just loaded from DB.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def version(self, model) -> str | None:
+        """
+        Current version of `model` table namespace, None if the backend is unavailable
+        """
+        try:
+            return await self.backend.version(_namespace(model))
+        except BACKEND_ERRORS as e:
+            self.errors += 1
+            logger.warning("Cache backend is unavailable: %r", e)
+            return None
+
+    async def get_or_load(
+        self,
+        model,
+        key: tuple,
+        loader: Callable[[], Awaitable[bytes | None]],
+        version: str | None = None,
+    ) -> bytes | None:
+        """
+        Get cached response for `key` of `model` table or load and cache it.
+        None (nothing found) is returned as is and is not cached.
+
+        `version` of the table must be taken before the response is loaded
+        (it is taken here if not passed): if the table is changed while we read it,
+        the response is stored under the old version and nobody gets it.
+        """
+        if version is None and (version := await self.version(model)) is None:
+            return await loader()
+
+        full_key = ":".join([_namespace(model), version, *map(str, key)])
+
+        if not self.enabled:
+            # Без кеша одинаковые одновременные запросы все равно делят один поход в БД
+            return await self.single_flight.do(full_key, loader)
+
+        try:
+            value = await self.backend.get(full_key)
+        except BACKEND_ERRORS as e:
+            self.errors += 1
+            logger.warning("Cache backend is unavailable: %r", e)
+            return await loader()
+
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        # Ключ с версией: запрос, начатый после записи, не получит результат, начатый до нее
+        return await self.single_flight.do(full_key, lambda: self._load(full_key, loader))
+
+    async def _load(
+        self, full_key: str, loader: Callable[[], Awaitable[bytes | None]]
+    ) -> bytes | None:
+        token = cache_fill.set(True)
+        try:
+            value = await loader()
+        finally:
+            cache_fill.reset(token)
+
+        if value is not None:
+            try:
+                await self.backend.set(full_key, value, self.ttl)
+            except BACKEND_ERRORS as e:
+                self.errors += 1
+                logger.warning("Cache backend is unavailable: %r", e)
+
+        return value
+
+    async def invalidate(self, *models) -> None:
+        for model in models:
+            namespace = _namespace(model)
+            try:
+                await self.backend.bump_version(namespace)
+            except BACKEND_ERRORS as e:
+                # Закешированные ответы таблицы доживут до TTL
+                self.errors += 1
+                logger.error("Cache of %s is not invalidated: %r", namespace, e)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "single_flight": self.single_flight.stats(),
+            "backend_stats": self.backend.stats(),
+        }
+
+
+response_cache = ResponseCache(
+    build_cache_backend(),
+    ttl=settings.cache_ttl_seconds,
+    enabled=settings.cache_enabled,
+)
+
+
+async def invalidate_cache(session: AsyncSession, *models) -> None:
+    """
+    Drop cached responses of `models` tables changed in this session.
+
+    Called by write handlers. Invalidates right away and once more after commit
+    (see `invalidate_pending`): a read which runs between the write and the commit
+    still sees old rows and may cache them under the new version.
+    """
+    await response_cache.invalidate(*models)
+    session.info.setdefault(_PENDING_KEY, set()).update(map(_namespace, models))
+
+
+async def invalidate_pending(session: AsyncSession) -> None:
+    """
+    Invalidate tables recorded by `invalidate_cache`, called after commit
+    """
+    if namespaces := session.info.pop(_PENDING_KEY, None):
+        await response_cache.invalidate(*namespaces)
@@ -0,0 +1,332 @@
+"""
+Модуль с хранилищами для кеша ответов.
+
+- memory: словарь в памяти процесса (LRU + TTL). Быстро, но у каждого воркера свой
+  кеш, и запись в одном воркере не сбрасывает кеш в остальных.
+- redis: общий для всех воркеров и подов сервер с протоколом Redis (RESP).
+  Версии таблиц лежат там же и увеличиваются через INCR, поэтому запись
+  в любом процессе сразу сбрасывает кеш во всех.
+
+Клиент Redis минимальный (GET/SET/MGET/INCR/DEL, EVAL для лимитов входа,
+поверх asyncio streams), чтобы не тянуть отдельную зависимость ради шести команд.
+"""
+
+import asyncio
+import secrets
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable
+from urllib.parse import unquote, urlsplit
+
+from .settings import settings
+
+__all__ = [
+    "CacheBackend",
+    "MemoryCacheBackend",
+    "RedisCacheBackend",
+    "RespConnection",
+    "RespError",
+    "TTLCache",
+    "build_cache_backend",
+]
+
+
+class TTLCache:
+    """
+    LRU cache bounded by number of entries, every entry lives `ttl` seconds
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CacheBackend(ABC):
+    """
+    Storage of cache entries (bytes by string key) and of namespace versions.
+
+    Version of a namespace is returned together with the epoch of the storage:
+    epoch changes when the storage loses its versions (restart, clear),
+    so version numbers which start from zero again never repeat old tags.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def version(self, namespace: str) -> str: ...
+
+    @abstractmethod
+    async def bump_version(self, namespace: str) -> None: ...
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+    @abstractmethod
+    def stats(self) -> dict: ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Cache in the memory of the current process
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.storage = TTLCache(max_entries, ttl)
+        self._versions: dict[str, int] = {}
+        # Эпоха процесса: после рестарта версии начинаются заново, а метки - нет
+        self._epoch = secrets.token_hex(8)
+
+    async def get(self, key: str) -> bytes | None:
+        return self.storage.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.storage.set(key, value, ttl)
+
+    async def version(self, namespace: str) -> str:
+        return f"{self._epoch}.{self._versions.get(namespace, 0)}"
+
+    async def bump_version(self, namespace: str) -> None:
+        self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    async def clear(self) -> None:
+        self.storage.clear()
+        self._versions.clear()
+        self._epoch = secrets.token_hex(8)
+
+    async def close(self) -> None:
+        self.storage.clear()
+
+    def stats(self) -> dict:
+        return {**self.storage.stats(), "versions": dict(self._versions)}
+
+
+class RespError(Exception):
+    """
+    Error reply of Redis server
+    """
+
+
+class RespConnection:
+    """
+    One connection to Redis server, commands are sent one by one (no pipelining)
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def open(
+        cls, host: str, port: int, password: str | None = None, db: int = 0
+    ) -> "RespConnection":
+        reader, writer = await asyncio.open_connection(host, port)
+        conn = cls(reader, writer)
+        try:
+            if password:
+                await conn.execute("AUTH", password)
+            if db:
+                await conn.execute("SELECT", db)
+        except BaseException:
+            conn.close()
+            raise
+
+        return conn
+
+    async def execute(self, *args: str | bytes | int | float) -> Any:
+        self._writer.write(self._encode(args))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    def close(self) -> None:
+        self._writer.close()
+
+    @staticmethod
+    def _encode(args: tuple) -> bytes:
+        # Команда - массив bulk строк: *<n>\r\n$<len>\r\n<arg>\r\n...
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%b\r\n" % (len(arg), arg))
+
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis connection closed")
+
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RespError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            return (await self._reader.readexactly(length + 2))[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+
+        raise RespError(f"Unknown reply: {line!r}")
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache shared by all processes on a Redis protocol server.
+
+    Keys are prefixed with `prefix`, so one server (db) can hold caches of several apps.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str, pool_size: int, timeout: float) -> None:
+        parsed = urlsplit(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+
+        self.prefix = prefix
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle: list[RespConnection] = []
+
+    async def execute(self, *args: str | bytes | int | float) -> Any:
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(
+                        RespConnection.open(self.host, self.port, self.password, self.db),
+                        self.timeout,
+                    )
+                reply = await asyncio.wait_for(conn.execute(*args), self.timeout)
+            except BaseException:
+                # После ошибки или таймаута в потоке может остаться чужой ответ - соединение не берем
+                if conn is not None:
+                    conn.close()
+                raise
+
+            self._idle.append(conn)
+            return reply
+
+    def _epoch_key(self) -> str:
+        return f"{self.prefix}:epoch"
+
+    def _version_key(self, namespace: str) -> str:
+        return f"{self.prefix}:version:{namespace}"
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.execute("GET", f"{self.prefix}:{key}")
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.execute("SET", f"{self.prefix}:{key}", value, "PX", int(ttl * 1000))
+
+    async def version(self, namespace: str) -> str:
+        epoch, version = await self.execute(
+            "MGET", self._epoch_key(), self._version_key(namespace)
+        )
+        if epoch is None:
+            # Сервер пустой (новый или очищен) - заводим эпоху, если ее еще никто не завел
+            await self.execute("SET", self._epoch_key(), secrets.token_hex(8), "NX")
+            epoch = await self.execute("GET", self._epoch_key())
+
+        return f"{epoch.decode()}.{int(version or 0)}"
+
+    async def bump_version(self, namespace: str) -> None:
+        await self.execute("INCR", self._version_key(namespace))
+
+    async def clear(self) -> None:
+        # Новая эпоха делает недостижимыми все старые записи, их удалит TTL
+        await self.execute("DEL", self._epoch_key())
+
+    async def close(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
+
+    def stats(self) -> dict:
+        return {
+            "server": f"{self.host}:{self.port}/{self.db}",
+            "idle_connections": len(self._idle),
+        }
+
+
+def build_cache_backend() -> CacheBackend:
+    """
+    Create cache backend chosen in settings
+    """
+    if settings.cache_backend == "redis":
+        return RedisCacheBackend(
+            settings.cache_redis_url,
+            settings.cache_key_prefix,
+            settings.cache_redis_pool_size,
+            settings.cache_redis_timeout,
+        )
+
+    return MemoryCacheBackend(settings.cache_max_entries, settings.cache_ttl_seconds)
@@ -0,0 +1,85 @@
+"""
+Модуль с пулом соединений, который считает время ожидания соединения.
+
+Стандартный пул SQLAlchemy умеет отдавать только текущее состояние
+(сколько соединений выдано и сколько простаивает), но не знает,
+сколько запросов ждут соединение и как долго. Эти цифры нужны,
+чтобы подбирать размер пула под каждый воркер по реальной нагрузке.
+"""
+
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+
+__all__ = ["MeteredAsyncQueuePool", "PoolWaitStats", "describe_pool"]
+
+
+class PoolWaitStats:
+    """
+    Counters of connection checkouts and waiting time
+    """
+
+    def __init__(self) -> None:
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.total_wait,
+            "wait_seconds_max": self.max_wait,
+            "wait_seconds_avg": self.total_wait / self.checkouts if self.checkouts else 0.0,
+        }
+
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async queue pool which records how long callers wait for a connection
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        stats = self.wait_stats
+        stats.waiting += 1
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.waiting -= 1
+        stats.record(time.perf_counter() - started)
+        return connection
+
+
+def describe_pool(pool: Pool) -> dict:
+    """
+    Snapshot of pool usage: checked out / idle connections, overflow and waiting stats
+    """
+    res = {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # До заполнения пула overflow() отрицательный
+        "overflow": max(pool.overflow(), 0),
+    }
+
+    if isinstance(pool, MeteredAsyncQueuePool):
+        res.update(pool.wait_stats.as_dict())
+
+    return res
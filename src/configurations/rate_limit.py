@@ -0,0 +1,237 @@
+"""
+Модуль с ограничением частоты входа и регистрации (token bucket).
+
+Каждая попытка входа - это проверка bcrypt, сотни миллисекунд CPU. Перебор паролей
+(credential stuffing) занимает ими все ядра. Здесь у каждого IP и каждого email
+своя корзина токенов: попытка забирает токен, токены восстанавливаются с заданной
+скоростью. Пустая корзина - сразу 429 с Retry-After, до запроса в БД и bcrypt.
+
+Корзина хранится как одно число - время, когда она снова станет полной (GCRA,
+та же корзина токенов без отдельного счетчика и таймера).
+
+- memory: корзины в памяти процесса, у каждого воркера свои.
+- redis: корзины общие для всех воркеров и подов, на сервере кеша (cache_redis_url).
+  Проверка и списание токена - один Lua скрипт, то есть атомарно.
+"""
+
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+
+from .cache import BACKEND_ERRORS
+from .cache_backends import RedisCacheBackend, TTLCache
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "MemoryRateLimitStore",
+    "RateLimitStore",
+    "RateLimited",
+    "RateLimiter",
+    "RedisRateLimitStore",
+    "build_rate_limit_store",
+    "email_rate_limiter",
+    "ip_rate_limiter",
+    "rate_limit_store",
+]
+
+
+class RateLimited(Exception):
+    """
+    Bucket of the key is empty, next attempt is allowed in `retry_after` seconds
+    """
+
+    def __init__(self, key: str, retry_after: float) -> None:
+        super().__init__(key, retry_after)
+        self.key = key
+        self.retry_after = retry_after
+
+
+class RateLimitStore(ABC):
+    """
+    Storage of token buckets.
+
+    `acquire` takes one token from the bucket of `key` holding at most `burst` tokens,
+    one token is restored every `interval` seconds. Returns 0 if the token is taken,
+    otherwise how many seconds to wait for the next one (nothing is taken then).
+    """
+
+    name: str
+
+    @abstractmethod
+    async def acquire(self, key: str, interval: float, burst: int) -> float: ...
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+    @abstractmethod
+    def stats(self) -> dict: ...
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """
+    Buckets in the memory of the current process, at most `max_keys` of them
+    (a full bucket is the same as no bucket, so it is dropped)
+    """
+
+    name = "memory"
+
+    def __init__(self, max_keys: int) -> None:
+        self._buckets = TTLCache(max_keys, ttl=0)
+
+    async def acquire(self, key: str, interval: float, burst: int) -> float:
+        now = time.monotonic()
+        # Время, когда корзина станет полной; в прошлом - корзина уже полная
+        full_at = max(self._buckets.get(key, now), now) + interval
+        allowed_at = full_at - burst * interval
+        if now < allowed_at:
+            return allowed_at - now
+
+        self._buckets.set(key, full_at, ttl=full_at - now)
+        return 0.0
+
+    async def clear(self) -> None:
+        self._buckets.clear()
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {"buckets": len(self._buckets), "max_keys": self._buckets.max_entries}
+
+
+# Время берется на сервере: у воркеров и подов часы могут расходиться.
+# Возвращает 0, если токен взят, иначе сколько миллисекунд ждать.
+_ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local full_at = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now) + interval
+local allowed_at = full_at - burst * interval
+if now < allowed_at then
+    return allowed_at - now
+end
+redis.call('SET', KEYS[1], full_at, 'PX', full_at - now)
+return 0
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """
+    Buckets shared by all processes on a Redis protocol server
+    """
+
+    name = "redis"
+
+    def __init__(self, backend: RedisCacheBackend) -> None:
+        self.backend = backend
+
+    def _key(self, key: str) -> str:
+        return f"{self.backend.prefix}:rate:{key}"
+
+    async def acquire(self, key: str, interval: float, burst: int) -> float:
+        wait_ms = await self.backend.execute(
+            "EVAL", _ACQUIRE_SCRIPT, 1, self._key(key), math.ceil(interval * 1000), burst
+        )
+        return wait_ms / 1000
+
+    async def clear(self) -> None:
+        # Корзины сами удаляются по TTL, когда становятся полными
+        pass
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+class RateLimiter:
+    """
+    Admission control by token buckets: `burst` tokens, `per_minute` restored tokens a minute.
+
+    If the store is unavailable, requests are let through (login must not depend on it).
+    """
+
+    def __init__(
+        self, store: RateLimitStore, per_minute: float, burst: int, enabled: bool = True
+    ) -> None:
+        self.store = store
+        self.interval = 60.0 / per_minute
+        self.burst = burst
+        self.enabled = enabled
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+
+    async def check(self, key: str) -> None:
+        """
+        Take a token from the bucket of `key`, raise `RateLimited` if it is empty
+        """
+        if not self.enabled:
+            return
+
+        try:
+            retry_after = await self.store.acquire(key, self.interval, self.burst)
+        except BACKEND_ERRORS as e:
+            self.errors += 1
+            logger.warning("Rate limit store is unavailable: %r", e)
+            return
+
+        if retry_after > 0:
+            self.rejected += 1
+            raise RateLimited(key, retry_after)
+
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "store": self.store.name,
+            "per_minute": 60.0 / self.interval,
+            "burst": self.burst,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "store_stats": self.store.stats(),
+        }
+
+
+def build_rate_limit_store() -> RateLimitStore:
+    """
+    Create rate limit store chosen in settings
+    """
+    if settings.rate_limit_backend == "redis":
+        return RedisRateLimitStore(
+            RedisCacheBackend(
+                settings.cache_redis_url,
+                settings.cache_key_prefix,
+                settings.cache_redis_pool_size,
+                settings.cache_redis_timeout,
+            )
+        )
+
+    return MemoryRateLimitStore(settings.rate_limit_max_keys)
+
+
+rate_limit_store = build_rate_limit_store()
+
+# Вход и регистрация: корзины по IP клиента и по email (у IP за NAT может быть много людей)
+ip_rate_limiter = RateLimiter(
+    rate_limit_store,
+    per_minute=settings.rate_limit_ip_per_minute,
+    burst=settings.rate_limit_ip_burst,
+    enabled=settings.rate_limit_enabled,
+)
+email_rate_limiter = RateLimiter(
+    rate_limit_store,
+    per_minute=settings.rate_limit_email_per_minute,
+    burst=settings.rate_limit_email_burst,
+    enabled=settings.rate_limit_enabled,
+)
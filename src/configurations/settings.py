@@ -13,6 +13,7 @@
 """
 
 from pathlib import Path
+from typing import Literal
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -21,9 +22,18 @@ SRC_DIR = Path(__file__).parent.parent
 
 
 class AuthJWT(BaseModel):
+    # Текущая пара ключей для подписи. Алгоритм - по типу ключа: RSA - RS256,
+    # EC P-256 - ES256, Ed25519 - EdDSA (см. configurations/auth/README.md)
     private_key_path: Path = SRC_DIR / "configurations" / "auth" / "certs" / "private.pem"
     public_key_path: Path = SRC_DIR / "configurations" / "auth" / "certs" / "public.pem"
-    algorithm: str = "RS256"
+    # Публичные ключи прошлых пар (*.pem): токены, подписанные ими, еще принимаются
+    previous_keys_dir: Path = SRC_DIR / "configurations" / "auth" / "certs" / "previous"
+    # Как часто (в секундах) проверять, не сменились ли файлы ключей
+    keys_reload_interval: float = 30.0
+    # Кеш уже проверенных токенов: сколько хранить и сколько секунд максимум
+    # (для токенов с exp - не дольше их срока действия)
+    payload_cache_size: int = 10000
+    payload_cache_ttl: float = 300.0
 
 
 class Settings(BaseSettings):
@@ -31,7 +41,77 @@ class Settings(BaseSettings):
     db_host: str
     db_name: str
     db_test_name: str = "fastapi_project_test_db"
-    max_connection_count: int = 10
+    max_connection_count: int = 10  # pool_size пула соединений на один воркер
+    db_max_overflow: int = 5  # сколько соединений можно открыть сверх пула при пиковой нагрузке
+    db_pool_timeout: float = 30.0  # сколько секунд ждать свободное соединение
+    db_pool_recycle: int = 1800  # через сколько секунд пересоздавать соединение (-1 - никогда)
+    db_pool_pre_ping: bool = True  # проверять соединение перед выдачей из пула
+    # Реплики только для чтения: полные URL, в .env задаются JSON списком.
+    # Ручки чтения ходят в них по кругу, запись всегда идет в основную БД.
+    db_replica_urls: list[str] = []
+    # Сколько секунд после записи читать с основной БД (чтобы клиент видел свои записи)
+    db_primary_pin_seconds: float = 5.0
+    # Применять миграции при старте (удобно для разработки). В проде - make migrate
+    db_auto_migrate: bool = False
+    # Токен ручек /api/v1/internal/stats (заголовок X-Internal-Token).
+    # Не задан - этих ручек нет (404): статистика воркера не для клиентов API
+    internal_stats_token: str | None = None
+
+    # Размер страницы для списков (keyset-пагинация)
+    page_size_default: int = 100
+    page_size_max: int = 1000
+    # Сколько строк за раз забирать из серверного курсора при потоковой выгрузке
+    export_chunk_size: int = 1000
+    # Массовое создание книг: максимум книг в запросе и строк в одном INSERT
+    bulk_max_items: int = 10000
+    bulk_insert_batch_size: int = 1000
+    # Импорт CSV через COPY: строк в одной пачке и сколько ошибок строк возвращать в ответе
+    import_chunk_size: int = 5000
+    import_max_reported_errors: int = 100
+    # Кеш ответов ручек чтения книг и продавцов
+    cache_enabled: bool = True
+    # memory - в памяти процесса, redis - общий для всех воркеров сервер Redis
+    cache_backend: Literal["memory", "redis"] = "memory"
+    cache_max_entries: int = (
+        10000  # для memory: сколько ответов хранить, лишние вытесняются (LRU)
+    )
+    cache_ttl_seconds: float = 30.0  # сколько секунд живет закешированный ответ
+    cache_redis_url: str = "redis://127.0.0.1:6379/0"
+    cache_redis_pool_size: int = 10  # соединений с Redis на один воркер
+    cache_redis_timeout: float = 1.0  # секунд на команду, дольше - работаем без кеша
+    cache_key_prefix: str = "mts_shad_fastapi"  # префикс ключей приложения в Redis
+    # Сжатие ответов (gzip; brotli и zstd - если установлены пакеты brotli / zstandard)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024  # байт, ответы меньше не сжимаются
+    compression_thread_size: int = 256 * 1024  # байт, тела больше сжимаются в пуле потоков
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+    # True - ответы из наших колонок пишутся в JSON сразу, без повторной валидации
+    # по response_model (быстрее для больших ответов). По умолчанию - как раньше, через FastAPI
+    trusted_output: bool = False
+    # Cache-Control ответов с ETag: по умолчанию клиент каждый раз сверяет ETag (If-None-Match)
+    http_cache_control: str = "no-cache"
+
+    # bcrypt: cost (log2 числа раундов) для новых хешей паролей
+    bcrypt_rounds: int = 12
+    # Потоков для bcrypt на воркер и сколько операций может ждать свободный поток.
+    # Если заняты все потоки и очередь, вход и регистрация сразу отвечают 503
+    password_hash_workers: int = 2
+    password_hash_queue_size: int = 32
+    password_hash_retry_after: int = 1  # Retry-After ответа 503, секунд
+
+    # Ограничение частоты входа и регистрации (token bucket) по IP клиента и по email:
+    # сколько попыток подряд (burst) и сколько токенов восстанавливается в минуту.
+    # Сверх лимита - 429 с Retry-After, без запроса в БД и без bcrypt
+    rate_limit_enabled: bool = True
+    # memory - корзины в памяти процесса, redis - общие на сервере cache_redis_url
+    rate_limit_backend: Literal["memory", "redis"] = "memory"
+    rate_limit_max_keys: int = 100000  # для memory: сколько корзин хранить
+    rate_limit_ip_per_minute: float = 60.0
+    rate_limit_ip_burst: int = 30
+    rate_limit_email_per_minute: float = 6.0
+    rate_limit_email_burst: int = 10
 
     auth_jwt: AuthJWT = AuthJWT()
 
@@ -0,0 +1,69 @@
+"""
+Модуль для объединения одинаковых одновременных запросов (single flight).
+
+Когда популярный ответ выпадает из кеша, десятки одновременных запросов
+делают один и тот же SELECT и забивают пул соединений. Здесь первый запрос
+(лидер) выполняет загрузку, а остальные с тем же ключом ждут и получают
+его результат - в БД уходит один запрос вместо десятков.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+__all__ = ["SingleFlight"]
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time, concurrent callers with the same key
+    share its result (or exception)
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0  # сколько раз загрузка действительно выполнялась
+        self.deduplicated = 0  # сколько запросов получили чужой результат
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while (future := self._calls.get(key)) is not None:
+            self.deduplicated += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменили лидера (клиент ушел), а не нас - загружаем заново
+                if future.cancelled() and not _current_task_cancelling():
+                    self.deduplicated -= 1
+                    continue
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        # Исключение лидера могут никогда не забрать (ждущих нет) - не пишем об этом в лог
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        self.leaders += 1
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "deduplicated": self.deduplicated,
+        }
+
+
+def _current_task_cancelling() -> bool:
+    task = asyncio.current_task()
+    return task is not None and task.cancelling() > 0
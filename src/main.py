@@ -3,18 +3,25 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
-from src.configurations.database import create_db_and_tables, delete_db_and_tables, global_init
+from src.configurations.auth.utils import password_hasher
+from src.configurations.cache import response_cache
+from src.configurations.database import check_db_schema, global_init
+from src.configurations.rate_limit import rate_limit_store
+from src.middlewares import CompressionMiddleware, PrimaryPinMiddleware
 from src.routers import v1_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  # Рекомендуется теперь вместо @app.on_event()
-    # Запускается при старте приложения
+    # Запускается при старте приложения.
+    # Схему создают миграции (make migrate), здесь только дешевая проверка версии схемы.
     global_init()
-    await create_db_and_tables()
+    await check_db_schema()
     yield
     # Запускается при остановке приложения
-    await delete_db_and_tables()
+    await response_cache.close()
+    await rate_limit_store.close()
+    password_hasher.shutdown()
 
 
 # Само приложение fastApi. именно оно запускается сервером и служит точкой входа
@@ -35,12 +42,14 @@ app = create_application()
 
 def _configure():
     app.include_router(v1_router)
+    app.add_middleware(PrimaryPinMiddleware)
+    app.add_middleware(CompressionMiddleware)
 
 
 # @app.on_event("startup")  # Вместо этого теперь рекомендуется lifespan
 # async def startup_event():
 #     global_init()
-#     await create_db_and_tables()
+#     await check_db_schema()
 
 
 _configure()
@@ -0,0 +1,4 @@
+from .compression import CompressionMiddleware
+from .primary_pin import PrimaryPinMiddleware
+
+__all__ = ["CompressionMiddleware", "PrimaryPinMiddleware"]
@@ -0,0 +1,211 @@
+"""
+Сжатие ответов (gzip, а также brotli и zstd, если установлены пакеты brotli / zstandard).
+
+Кодировка выбирается по Accept-Encoding клиента. Маленькие ответы (TokenInfo, одна книга)
+не сжимаются: выигрыш в байтах меньше, чем время на сжатие. Большие тела сжимаются
+в пуле потоков (zlib, brotli и zstd отпускают GIL), чтобы не останавливать event loop.
+Потоковые ответы (выгрузка NDJSON) сжимаются по частям: каждая часть уходит клиенту сразу.
+"""
+
+import asyncio
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.configurations.settings import settings
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен - только gzip / zstd
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard не установлен - только gzip / br
+    zstandard = None
+
+
+class _Compressor:
+    """
+    Streaming compressor of one response body
+    """
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._zstd = zstandard.ZstdCompressor(
+                level=settings.compression_zstd_level
+            ).compressobj()
+        elif encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.compression_brotli_quality)
+        else:
+            # wbits=31 - формат gzip (заголовок и контрольная сумма)
+            self._zlib = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        """
+        Compress next part of the body, with `flush` all of it is returned right away
+        """
+        if self.encoding == "zstd":
+            chunk = self._zstd.compress(data)
+            return (
+                chunk + self._zstd.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else chunk
+            )
+        if self.encoding == "br":
+            chunk = self._brotli.process(data)
+            return chunk + self._brotli.flush() if flush else chunk
+
+        chunk = self._zlib.compress(data)
+        return chunk + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else chunk
+
+    def finish(self) -> bytes:
+        if self.encoding == "zstd":
+            return self._zstd.flush()
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def available_encodings() -> list[str]:
+    """
+    Encodings the server can produce, in order of preference
+    """
+    encodings = ["zstd"] if zstandard is not None else []
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+
+    return encodings
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Best encoding accepted by the client (Accept-Encoding with q values), None - do not compress
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, *params = item.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+
+    default_q = accepted.get("*", 0.0)
+    candidates = [
+        (accepted.get(encoding, default_q), -index, encoding)
+        for index, encoding in enumerate(available_encodings())
+    ]
+    q, _, encoding = max(candidates)
+
+    return encoding if q > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    Compress response bodies of at least `compression_minimum_size` bytes.
+
+    Pure ASGI middleware: a complete body is compressed at once (in a thread if it is
+    at least `compression_thread_size` bytes), a streaming body - part by part.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressedResponder(encoding, send)
+        await self.app(scope, receive, responder.send_compressed)
+
+
+class _CompressedResponder:
+    def __init__(self, encoding: str, send: Send) -> None:
+        self.encoding = encoding
+        self.send = send
+        self.start: Message | None = None
+        self.compressor: _Compressor | None = None
+        self.passthrough = False
+
+    def _start_headers(self, length: int | None) -> MutableHeaders:
+        headers = MutableHeaders(scope=self.start)
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("accept-encoding")
+        if length is None:
+            del headers["content-length"]
+        else:
+            headers["content-length"] = str(length)
+        # Сжатое тело - другое представление: сильный ETag становится слабым
+        if (etag := headers.get("etag")) and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+
+        return headers
+
+    async def _compress(self, data: bytes, flush: bool) -> bytes:
+        if len(data) >= settings.compression_thread_size:
+            return await asyncio.to_thread(self.compressor.compress, data, flush)
+        return self.compressor.compress(data, flush)
+
+    async def send_compressed(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            # Заголовки отправим, когда увидим тело: от него зависит, сжимать ли
+            self.start = message
+            if Headers(raw=message["headers"]).get("content-encoding"):
+                self.passthrough = True
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < settings.compression_minimum_size:
+                # Маленький или пустой ответ (204, 304) - как есть
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding)
+            if not more_body:
+                compressed = await self._compress(body, flush=False) + self.compressor.finish()
+                self._start_headers(len(compressed))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Потоковый ответ: длина заранее неизвестна
+            self._start_headers(None)
+            await self.send(self.start)
+
+        if more_body:
+            compressed = await self._compress(body, flush=True)
+        else:
+            compressed = await self._compress(body, flush=False) + self.compressor.finish()
+
+        await self.send(
+            {"type": "http.response.body", "body": compressed, "more_body": more_body}
+        )
@@ -0,0 +1,39 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.configurations.database import PRIMARY_PIN_COOKIE
+from src.configurations.settings import settings
+
+
+class PrimaryPinMiddleware:
+    """
+    Set primary pin cookie for clients which have just written to the DB.
+
+    Pin is put into request state by get_async_session after commit, and
+    read sessions send such clients to primary instead of replicas.
+    Pure ASGI middleware (not BaseHTTPMiddleware): it sees the same request
+    state as the handlers and does not wrap the response body.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                until = scope.get("state", {}).get("db_primary_until")
+                if until is not None:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "set-cookie",
+                        f"{PRIMARY_PIN_COOKIE}={until:.3f}; "
+                        f"Max-Age={int(settings.db_primary_pin_seconds) + 1}; "
+                        "Path=/; HttpOnly; SameSite=Lax",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
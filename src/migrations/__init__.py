@@ -0,0 +1,16 @@
+"""
+Версионные миграции схемы БД.
+
+Каждая миграция - модуль в пакете versions с номером версии и функцией upgrade().
+Примененные версии записываются в таблицу schema_version.
+Миграции применяются отдельной командой, а не при старте приложения:
+
+    python -m src.migrations upgrade   # или make migrate
+    python -m src.migrations current
+
+При старте приложение только проверяет, что версия схемы не ниже ожидаемой.
+"""
+
+from .manager import *  # noqa F403
+
+__all__ = manager.__all__  # noqa F405
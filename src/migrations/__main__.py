@@ -0,0 +1,39 @@
+"""
+Команды для миграций схемы БД:
+
+    python -m src.migrations upgrade  - применить все новые миграции
+    python -m src.migrations current  - показать текущую и ожидаемую версию схемы
+
+По умолчанию работает с основной БД, другую можно передать через --database-url
+(например, локальную "реплику" - отдельную базу на том же сервере).
+"""
+
+import argparse
+import asyncio
+import logging
+
+from src.configurations.database import SQLALCHEMY_DATABASE_URL, build_async_engine
+
+from .manager import HEAD_VERSION, get_current_version, upgrade
+
+
+async def _main(command: str, database_url: str) -> None:
+    engine = build_async_engine(database_url)
+    try:
+        if command == "upgrade":
+            applied = await upgrade(engine)
+            print(f"applied migrations: {applied or 'none'}")
+
+        print(f"schema version: {await get_current_version(engine)}, head: {HEAD_VERSION}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m src.migrations")
+    parser.add_argument("command", choices=["upgrade", "current"])
+    parser.add_argument("--database-url", default=SQLALCHEMY_DATABASE_URL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.command, args.database_url))
@@ -0,0 +1,127 @@
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .versions import MIGRATIONS
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "HEAD_VERSION",
+    "SchemaVersionError",
+    "check_schema_version",
+    "get_current_version",
+    "upgrade",
+]
+
+HEAD_VERSION = MIGRATIONS[-1].version
+
+# Ключ advisory lock, чтобы миграции не применяли одновременно несколько процессов
+_MIGRATIONS_LOCK_KEY = 7_318_203
+
+_CREATE_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER NOT NULL PRIMARY KEY,
+        description VARCHAR NOT NULL,
+        applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+    )
+"""
+
+if [m.version for m in MIGRATIONS] != list(range(1, len(MIGRATIONS) + 1)):
+    raise RuntimeError("Migration versions must go one by one starting from 1")
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+async def _read_version(conn: AsyncConnection) -> int:
+    res = await conn.execute(text("SELECT coalesce(max(version), 0) FROM schema_version"))
+    return res.scalar()
+
+
+async def get_current_version(engine: AsyncEngine) -> int:
+    """
+    Version of the DB schema (0 if no migrations were applied)
+    """
+    async with engine.connect() as conn:
+        try:
+            return await _read_version(conn)
+        except ProgrammingError:  # Таблицы schema_version еще нет
+            return 0
+
+
+async def check_schema_version(engine: AsyncEngine) -> int:
+    """
+    Cheap startup check: one query, no DDL.
+
+    Raises SchemaVersionError if DB schema is older than the code expects.
+    Newer schema is allowed (e.g. code rollback after migration), migrations
+    are expected to be backward compatible.
+    """
+    current = await get_current_version(engine)
+
+    if current < HEAD_VERSION:
+        raise SchemaVersionError(
+            f"DB schema version is {current}, expected {HEAD_VERSION}. "
+            "Apply migrations: python -m src.migrations upgrade"
+        )
+    if current > HEAD_VERSION:
+        logger.warning("DB schema version %s is newer than code (%s)", current, HEAD_VERSION)
+
+    return current
+
+
+async def _record_version(conn: AsyncConnection, migration) -> None:
+    await conn.execute(
+        text(
+            "INSERT INTO schema_version (version, description) VALUES (:version, :description)"
+        ),
+        {"version": migration.version, "description": migration.description},
+    )
+
+
+async def upgrade(engine: AsyncEngine) -> list[int]:
+    """
+    Apply pending migrations, returns applied versions.
+
+    Transactional migrations run together with their version record in one transaction.
+    Non-transactional ones (e.g. CREATE INDEX CONCURRENTLY) run in AUTOCOMMIT
+    and must be idempotent, as they can be interrupted in the middle.
+    """
+    applied = []
+
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_conn.execute(text(_CREATE_VERSION_TABLE))
+        await lock_conn.execute(text(f"SELECT pg_advisory_lock({_MIGRATIONS_LOCK_KEY})"))
+
+        try:
+            # Версию читаем уже под блокировкой: другой процесс мог успеть все применить
+            current = await _read_version(lock_conn)
+
+            for migration in MIGRATIONS:
+                if migration.version <= current:
+                    continue
+
+                logger.info(
+                    "Applying migration %s: %s", migration.version, migration.description
+                )
+
+                if migration.transactional:
+                    async with engine.begin() as conn:
+                        await migration.upgrade(conn)
+                        await _record_version(conn, migration)
+                else:
+                    async with engine.connect() as conn:
+                        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                        await migration.upgrade(conn)
+                        await _record_version(conn, migration)
+
+                applied.append(migration.version)
+        finally:
+            await lock_conn.execute(text(f"SELECT pg_advisory_unlock({_MIGRATIONS_LOCK_KEY})"))
+
+    return applied
@@ -0,0 +1,30 @@
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+
+async def create_index_concurrently(conn: AsyncConnection, name: str, ddl: str) -> None:
+    """
+    Create index without locking writes to the table.
+
+    `ddl` must be `CREATE [UNIQUE] INDEX CONCURRENTLY IF NOT EXISTS ...` and `conn`
+    must be in AUTOCOMMIT mode (CONCURRENTLY can not run inside a transaction).
+    If a previous attempt failed, Postgres leaves an INVALID index with the same
+    name (IF NOT EXISTS would skip it), so such index is dropped and built again.
+    """
+    res = await conn.execute(
+        text(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+        ),
+        {"name": name},
+    )
+    if res.scalar():
+        logger.warning("Index %s is invalid, rebuilding it", name)
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+    await conn.execute(text(ddl))
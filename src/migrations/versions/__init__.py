@@ -0,0 +1,7 @@
+from . import v0001_initial, v0002_seller_indexes
+
+# Порядок применения миграций. Новую миграцию добавляем в конец списка.
+MIGRATIONS = [
+    v0001_initial,
+    v0002_seller_indexes,
+]
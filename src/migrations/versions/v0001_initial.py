@@ -0,0 +1,64 @@
+"""
+Initial schema: sellers and books tables (JWT and non-JWT).
+
+IF NOT EXISTS allows to adopt databases created earlier by create_all().
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+version = 1
+description = "initial schema"
+transactional = True
+
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS sellers_table (
+        id SERIAL NOT NULL,
+        first_name VARCHAR(100) NOT NULL,
+        second_name VARCHAR(100) NOT NULL,
+        email VARCHAR(100) NOT NULL,
+        password VARCHAR NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS books_table (
+        id SERIAL NOT NULL,
+        seller_id INTEGER NOT NULL,
+        title VARCHAR(50) NOT NULL,
+        author VARCHAR(100) NOT NULL,
+        year INTEGER NOT NULL,
+        count_pages INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY (seller_id) REFERENCES sellers_table (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sellers_jwt_table (
+        id SERIAL NOT NULL,
+        first_name VARCHAR(100) NOT NULL,
+        second_name VARCHAR(100) NOT NULL,
+        email VARCHAR(100) NOT NULL,
+        password BYTEA NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS books_jwt_table (
+        id SERIAL NOT NULL,
+        seller_id INTEGER NOT NULL,
+        title VARCHAR(50) NOT NULL,
+        author VARCHAR(100) NOT NULL,
+        year INTEGER NOT NULL,
+        count_pages INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY (seller_id) REFERENCES sellers_jwt_table (id) ON DELETE CASCADE
+    )
+    """,
+]
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    for ddl in DDL:
+        await conn.execute(text(ddl))
@@ -0,0 +1,35 @@
+"""
+Indexes on books seller_id (seller's books lookup, ON DELETE CASCADE)
+and unique index on sellers_jwt email (login and signup lookups).
+
+Indexes are built CONCURRENTLY, so writes to the tables are not blocked.
+Unique index fails if sellers_jwt_table already has duplicate emails.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from ..operations import create_index_concurrently
+
+version = 2
+description = "seller indexes"
+transactional = False
+
+INDEXES = {
+    "ix_books_table_seller_id": (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_books_table_seller_id "
+        "ON books_table (seller_id)"
+    ),
+    "ix_books_jwt_table_seller_id": (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_books_jwt_table_seller_id "
+        "ON books_jwt_table (seller_id)"
+    ),
+    "ix_sellers_jwt_table_email": (
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_sellers_jwt_table_email "
+        "ON sellers_jwt_table (email)"
+    ),
+}
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    for name, ddl in INDEXES.items():
+        await create_index_concurrently(conn, name, ddl)
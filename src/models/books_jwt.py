@@ -1,5 +1,5 @@
 from sqlalchemy import String, Integer, ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import BaseModel
 from .sellers_jwt import SellerJWT
@@ -9,10 +9,13 @@ class BookJWT(BaseModel):
     __tablename__ = "books_jwt_table"
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    # Индекс нужен для выборки книг продавца и для ON DELETE CASCADE при удалении продавца
     seller_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey(SellerJWT.id, ondelete="CASCADE")
+        Integer, ForeignKey(SellerJWT.id, ondelete="CASCADE"), index=True
     )
     title: Mapped[str] = mapped_column(String(50), nullable=False)
     author: Mapped[str] = mapped_column(String(100), nullable=False)
     year: Mapped[int]
     count_pages: Mapped[int]
+
+    seller: Mapped[SellerJWT] = relationship(back_populates="books", lazy="raise")
@@ -1,8 +1,13 @@
+from typing import TYPE_CHECKING
+
 from sqlalchemy import String
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import BaseModel
 
+if TYPE_CHECKING:
+    from .books import Book
+
 
 class Seller(BaseModel):
     __tablename__ = "sellers_table"
@@ -12,3 +17,12 @@ class Seller(BaseModel):
     second_name: Mapped[str] = mapped_column(String(100), nullable=False)
     email: Mapped[str] = mapped_column(String(100), nullable=False)
     password: Mapped[str] = mapped_column(String(), nullable=False)
+
+    # Книги продавца. При удалении продавца их удаляет сама БД (ON DELETE CASCADE),
+    # поэтому ORM их не загружает (passive_deletes). lazy="raise" - только явная загрузка.
+    books: Mapped[list["Book"]] = relationship(
+        back_populates="seller",
+        cascade="all, delete",
+        passive_deletes=True,
+        lazy="raise",
+    )
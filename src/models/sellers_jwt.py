@@ -1,8 +1,13 @@
+from typing import TYPE_CHECKING
+
 from sqlalchemy import String, LargeBinary
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import BaseModel
 
+if TYPE_CHECKING:
+    from .books_jwt import BookJWT
+
 
 class SellerJWT(BaseModel):
     __tablename__ = "sellers_jwt_table"
@@ -10,5 +15,15 @@ class SellerJWT(BaseModel):
     id: Mapped[int] = mapped_column(primary_key=True)
     first_name: Mapped[str] = mapped_column(String(100), nullable=False)
     second_name: Mapped[str] = mapped_column(String(100), nullable=False)
-    email: Mapped[str] = mapped_column(String(100), nullable=False)
+    # По email ищем продавца при каждом логине и регистрации, он же должен быть уникальным
+    email: Mapped[str] = mapped_column(String(100), nullable=False, unique=True, index=True)
     password: Mapped[bytes]  # = mapped_column(LargeBinary, nullable=False)
+
+    # Книги продавца. При удалении продавца их удаляет сама БД (ON DELETE CASCADE),
+    # поэтому ORM их не загружает (passive_deletes). lazy="raise" - только явная загрузка.
+    books: Mapped[list["BookJWT"]] = relationship(
+        back_populates="seller",
+        cascade="all, delete",
+        passive_deletes=True,
+        lazy="raise",
+    )
@@ -0,0 +1,71 @@
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from src.configurations.auth.utils import password_hasher
+from src.configurations.cache import response_cache
+from src.configurations.database import get_pool_stats
+from src.configurations.rate_limit import email_rate_limiter, ip_rate_limiter
+from src.configurations.settings import settings
+
+
+async def verify_internal_token(x_internal_token: str | None = Header(default=None)) -> None:
+    """
+    Let through only requests with the internal token from settings (X-Internal-Token).
+    Without a configured token the internal endpoints do not exist (404).
+    """
+    if settings.internal_stats_token is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    if x_internal_token is None or not secrets.compare_digest(
+        x_internal_token.encode(), settings.internal_stats_token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid internal token"
+        )
+
+
+# Статистика воркера (пулы, кеш, очереди, лимиты) - не для клиентов API: только с токеном
+# и без описания в OpenAPI
+stats_router = APIRouter(
+    tags=["internal"],
+    prefix="/internal/stats",
+    dependencies=[Depends(verify_internal_token)],
+    include_in_schema=False,
+)
+
+
+@stats_router.get("/db_pool")
+async def get_db_pool_stats():
+    """
+    Handle to get connection pools usage (primary and replicas) of the current worker
+    (checked out and idle connections, overflow, waiting requests and wait time)
+    """
+    return get_pool_stats()
+
+
+@stats_router.get("/cache")
+async def get_cache_stats():
+    """
+    Handle to get response cache usage of the current worker
+    (entries, hits and misses, evictions, table versions)
+    """
+    return response_cache.stats()
+
+
+@stats_router.get("/password_hasher")
+async def get_password_hasher_stats():
+    """
+    Handle to get bcrypt thread pool usage of the current worker
+    (pending operations, completed and rejected with 503)
+    """
+    return password_hasher.stats()
+
+
+@stats_router.get("/rate_limit")
+async def get_rate_limit_stats():
+    """
+    Handle to get login and signup rate limits of the current worker
+    (allowed and rejected attempts by client IP and by email)
+    """
+    return {"ip": ip_rate_limiter.stats(), "email": email_rate_limiter.stats()}
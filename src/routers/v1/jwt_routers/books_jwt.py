@@ -1,51 +1,125 @@
-from typing import Annotated
+from operator import itemgetter
+from typing import Annotated, Any, Callable
 
-from fastapi import APIRouter, Depends, Response, status, Form, HTTPException
+from fastapi import APIRouter, Body, Depends, Request, Response, status, Form, HTTPException
+from fastapi.responses import StreamingResponse
 
 # from icecream import ic
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.status import HTTP_404_NOT_FOUND
 
-from src.configurations.database import get_async_session
+from src.configurations.cache import invalidate_cache
+from src.configurations.database import (
+    get_async_read_session,
+    get_async_read_session_maker,
+    get_async_session,
+)
+from src.configurations.settings import settings
 from src.models.books_jwt import BookJWT
 
 # from src.models.sellers import Seller
 
 from src.schemas import (
+    IncomingBookForSeller,
     ReturnedAllBooks,
     ReturnedBook,
-    ReturnedSellerJWT,
+    ReturnedBulkBooks,
 )
 
-books_jwt_router = APIRouter(tags=["JWT"], prefix="/jwt")
-
+from ..utils.bulk import insert_in_batches, validate_items
+from ..utils.export import NDJSON_MEDIA_TYPE, ndjson_export_response
+from ..utils.fields import SPARSE_RESPONSES, FieldsParams, fields_key
+from ..utils.json_reads import cached_json_response, load_page_json, load_row_json
+from ..utils.msgpack_support import MsgpackRoute
+from ..utils.pagination import PageParams
+from ..utils.trusted_output import trusted_json_response
 from .utils.utils_jwt import (
-    get_current_auth_seller,
+    get_current_auth_seller_id,
 )
 
+# MsgpackRoute: тело запросов (например, массового создания) можно передать и в msgpack
+books_jwt_router = APIRouter(tags=["JWT"], prefix="/jwt", route_class=MsgpackRoute)
+
 # Больше не симулируем хранилище данных. Подключаемся к реальному, через сессию.
 DBSession = Annotated[AsyncSession, Depends(get_async_session)]
+# Сессия только для чтения (READ ONLY транзакция, без commit) - для ручек, которые ничего не пишут
+ReadSession = Annotated[AsyncSession, Depends(get_async_read_session)]
+# Фабрика сессий только для чтения для ручек, которые читают БД уже после выхода
+# из обработчика (стриминг). Как и ReadSession, ходит в реплики.
+ReadSessionMaker = Annotated[Callable[[], AsyncSession], Depends(get_async_read_session_maker)]
+# SQLSTATE нарушения внешнего ключа (книга продавца, которого уже нет)
+FOREIGN_KEY_VIOLATION = "23503"
+# Колонки книги, выбранные параметром fields (по умолчанию все)
+BookFields = Annotated[
+    list,
+    Depends(
+        FieldsParams(
+            [
+                BookJWT.id,
+                BookJWT.seller_id,
+                BookJWT.title,
+                BookJWT.author,
+                BookJWT.year,
+                BookJWT.count_pages,
+            ]
+        )
+    ),
+]
+
+
+@books_jwt_router.get(
+    "/books/list", response_model=ReturnedAllBooks, responses=SPARSE_RESPONSES
+)
+async def get_all_books(
+    request: Request,
+    session: ReadSession,
+    columns: BookFields,
+    page: PageParams = Depends(),
+):
+    """
+    Handle to get page of books from DB (ordered by id, use next_cursor to get next page).
+    With `fields` only the listed columns (and id) are selected and returned.
+    """
+    return await cached_json_response(
+        request,
+        BookJWT,
+        ("list", page.limit, page.after, fields_key(columns)),
+        lambda: load_page_json(session, "books", columns, page),
+    )
 
 
-@books_jwt_router.get("/books/list", response_model=ReturnedAllBooks)
-async def get_all_books(session: DBSession):
+@books_jwt_router.get(
+    "/books/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def export_books(session_maker: ReadSessionMaker, columns: BookFields):
     """
-    Handle to get all books from DB
+    Handle to stream all books from DB as newline-delimited JSON (one book per line).
+    Rows are read with a server-side cursor, so memory does not grow with the table size.
     """
-    query = select(BookJWT)
-    res = await session.execute(query)
-    books = res.scalars().all()
-    return {"books": books}
+    return ndjson_export_response(session_maker, columns)
 
 
-@books_jwt_router.get("/books/{book_id}", response_model=ReturnedBook)
-async def get_book_by_id(book_id: int, session: DBSession):
+@books_jwt_router.get(
+    "/books/{book_id}", response_model=ReturnedBook, responses=SPARSE_RESPONSES
+)
+async def get_book_by_id(
+    book_id: int, request: Request, session: ReadSession, columns: BookFields
+):
     """
     Handle to get book from DB by its id
     """
-    res = await session.get(BookJWT, book_id)
-    return res
+    if response := await cached_json_response(
+        request,
+        BookJWT,
+        ("id", book_id, fields_key(columns)),
+        lambda: load_row_json(session, columns, book_id),
+    ):
+        return response
+
+    return Response(status_code=HTTP_404_NOT_FOUND)
 
 
 @books_jwt_router.post(
@@ -58,23 +132,76 @@ async def add_book_seller_jwt(
     author: str = Form(),
     year: int = Form(),
     count_pages: int = Form(),
-    seller: ReturnedSellerJWT = Depends(get_current_auth_seller),
+    seller_id: int = Depends(get_current_auth_seller_id),
     session=Depends(get_async_session),
 ):
     """
     Handle to add new book for current authenticated seller
     """
     new_book = BookJWT(
-        seller_id=seller.id,
+        seller_id=seller_id,
         title=title,
         author=author,
         year=year,
         count_pages=count_pages,
     )
     session.add(new_book)
-    await session.flush()
+    try:
+        await session.flush()
+    except IntegrityError as e:
+        # Продавец удален, а проверка его токена еще в кеше (например, другого воркера)
+        if getattr(e.orig, "sqlstate", None) == FOREIGN_KEY_VIOLATION:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="token invalid"
+            )
+        raise
+    await invalidate_cache(session, BookJWT)
 
-    return new_book
+    return trusted_json_response(ReturnedBook, new_book, status.HTTP_201_CREATED)
+
+
+@books_jwt_router.post(
+    "/sellers/me/books/add_bulk",
+    response_model=ReturnedBulkBooks,
+    status_code=status.HTTP_201_CREATED,
+)
+async def add_books_bulk_seller_jwt(
+    books: Annotated[list[Any], Body(max_length=settings.bulk_max_items)],
+    seller_id: int = Depends(get_current_auth_seller_id),
+    session=Depends(get_async_session),
+):
+    """
+    Handle to add list of books for current authenticated seller.
+
+    Books are inserted in batches with multi-row INSERT ... RETURNING.
+    Invalid books do not fail the request: they are returned in `errors`
+    with their positions in the incoming list.
+    """
+    valid, errors = validate_items(books, IncomingBookForSeller)
+
+    rows = [(index, {**book.model_dump(), "seller_id": seller_id}) for index, book in valid]
+
+    created, db_errors = await insert_in_batches(
+        session,
+        BookJWT,
+        rows,
+        [
+            BookJWT.id,
+            BookJWT.seller_id,
+            BookJWT.title,
+            BookJWT.author,
+            BookJWT.year,
+            BookJWT.count_pages,
+        ],
+    )
+
+    if created:
+        await invalidate_cache(session, BookJWT)
+
+    errors = sorted(errors + db_errors, key=itemgetter("index"))
+    return trusted_json_response(
+        ReturnedBulkBooks, {"books": created, "errors": errors}, status.HTTP_201_CREATED
+    )
 
 
 @books_jwt_router.put("/sellers/me/books/{book_id}/update", response_model=ReturnedBook)
@@ -84,7 +211,7 @@ async def update_book_seller_jwt(
     author: None | str = Form(default=None),
     year: None | int = Form(default=None),
     count_pages: None | int = Form(default=None),
-    seller: ReturnedSellerJWT = Depends(get_current_auth_seller),
+    seller_id: int = Depends(get_current_auth_seller_id),
     session=Depends(get_async_session),
 ):
     """
@@ -94,9 +221,9 @@ async def update_book_seller_jwt(
     """
     if updated_book := await session.get(BookJWT, book_id):
 
-        if updated_book.seller_id == seller.id:
+        if updated_book.seller_id == seller_id:
 
-            updated_book.seller_id = seller.id
+            updated_book.seller_id = seller_id
 
             if author != None:
                 updated_book.author = author
@@ -108,8 +235,9 @@ async def update_book_seller_jwt(
                 updated_book.count_pages = count_pages
 
             await session.flush()
+            await invalidate_cache(session, BookJWT)
 
-            return updated_book
+            return trusted_json_response(ReturnedBook, updated_book)
 
         raise HTTPException(
             status_code=status.HTTP_406_NOT_ACCEPTABLE,
@@ -122,7 +250,7 @@ async def update_book_seller_jwt(
 @books_jwt_router.delete("/sellers/me/books/{book_id}/delete_book")
 async def delete_book_seller_jwt(
     book_id: int,
-    seller: ReturnedSellerJWT = Depends(get_current_auth_seller),
+    seller_id: int = Depends(get_current_auth_seller_id),
     session=Depends(get_async_session),
 ):
     """
@@ -130,8 +258,9 @@ async def delete_book_seller_jwt(
     """
     if deleted_book := await session.get(BookJWT, book_id):
 
-        if deleted_book.seller_id == seller.id:
+        if deleted_book.seller_id == seller_id:
             await session.delete(deleted_book)
+            await invalidate_cache(session, BookJWT)
             return Response(status_code=status.HTTP_204_NO_CONTENT)
 
         raise HTTPException(
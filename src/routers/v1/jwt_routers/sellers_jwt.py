@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, Response, status, Form
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Form
 from pydantic import EmailStr
+from sqlalchemy.exc import IntegrityError
 
 # from icecream import ic
-from sqlalchemy import select
 
-from src.configurations.database import get_async_session
+from src.configurations.cache import invalidate_cache
+from src.configurations.database import get_async_read_session, get_async_session
 from src.configurations.auth import utils as auth_utils
+from src.configurations.auth.passwords import PasswordHasherBusy
+from src.configurations.settings import settings
 
-# from src.models.books_jwt import BookJWT
+from src.models.books_jwt import BookJWT
 from src.models.sellers_jwt import SellerJWT
 
 from src.schemas import (
@@ -19,15 +24,33 @@ from src.schemas import (
     ReturnedSellerJWTFull,
 )
 
+from ..utils.fields import SPARSE_RESPONSES, FieldsParams, fields_key
+from ..utils.json_reads import cached_json_response, etag_json_response, load_page_json
+from ..utils.pagination import PageParams
+from ..utils.trusted_output import json_bytes, trusted_json_response
 from .utils.utils_jwt import (
     get_current_auth_seller,
     get_current_auth_seller_full,
+    password_hasher_busy_exc,
     validate_auth_user,
     validate_registration_user,
 )
 
 seller_jwt_router = APIRouter(tags=["JWT"], prefix="/jwt")
 
+# SQLSTATE нарушения уникальности (email уже занят другим продавцом)
+UNIQUE_VIOLATION = "23505"
+
+# Колонки продавца, выбранные параметром fields (по умолчанию все)
+SellerFields = Annotated[
+    list,
+    Depends(
+        FieldsParams(
+            [SellerJWT.id, SellerJWT.first_name, SellerJWT.second_name, SellerJWT.email]
+        )
+    ),
+]
+
 
 @seller_jwt_router.post(
     "/signup", response_model=ReturnedSellerJWT, status_code=status.HTTP_201_CREATED
@@ -39,16 +62,41 @@ async def register_seller_jwt(
     """
     Handle to create (register) new seller
     """
+    try:
+        hashed_password = await auth_utils.password_hasher.hash(seller.password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy_exc()
+
     new_seller_jwt = SellerJWT(
         first_name=seller.first_name,
         second_name=seller.second_name,
         email=seller.email,
-        password=auth_utils.hash_password(seller.password),
+        password=hashed_password,
     )
 
     session.add(new_seller_jwt)
-    await session.flush()
-    return new_seller_jwt
+    try:
+        await session.flush()
+    except IntegrityError as e:
+        # Email заняли между проверкой в validate_registration_user и вставкой
+        if getattr(e.orig, "sqlstate", None) == UNIQUE_VIOLATION:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Try to login, this email is already taken",
+            )
+        raise
+    await invalidate_cache(session, SellerJWT)
+    return trusted_json_response(ReturnedSellerJWT, new_seller_jwt, status.HTTP_201_CREATED)
+
+
+@seller_jwt_router.get("/.well-known/jwks.json")
+async def get_jwks(response: Response):
+    """
+    Handle to get public keys (JWKS) to verify tokens issued by this service.
+    Token header `kid` tells which of the keys was used.
+    """
+    response.headers["Cache-Control"] = f"max-age={int(settings.auth_jwt.keys_reload_interval)}"
+    return auth_utils.keyring.jwks()
 
 
 @seller_jwt_router.post("/login", response_model=TokenInfo)
@@ -69,12 +117,13 @@ async def auth_seller_jwt(
 
 @seller_jwt_router.get("/sellers/me/info", response_model=ReturnedSellerJWTFull)
 async def auth_seller_jwt_check_self_info(
+    request: Request,
     seller: ReturnedSellerJWTFull = Depends(get_current_auth_seller_full),
 ):
     """
     Handle to get seller's info by his jwt
     """
-    return seller
+    return etag_json_response(request, json_bytes(ReturnedSellerJWTFull, seller), private=True)
 
 
 @seller_jwt_router.put("/sellers/me/info/update", response_model=ReturnedSellerJWT)
@@ -97,9 +146,17 @@ async def update_seller_jwt(
     if second_name != None:
         seller.second_name = second_name
 
-    await session.flush()
+    try:
+        await session.flush()
+    except IntegrityError as e:
+        if getattr(e.orig, "sqlstate", None) == UNIQUE_VIOLATION:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="This email is already taken"
+            )
+        raise
+    await invalidate_cache(session, SellerJWT)
 
-    return seller
+    return trusted_json_response(ReturnedSellerJWT, seller)
 
 
 @seller_jwt_router.delete("/sellers/me/delete_account")
@@ -111,17 +168,27 @@ async def delete_seller_jwt(
     Handle to delete current authorized seller from DB. Seller's books will be deteted too.
     """
     await session.delete(seller)
+    # Книги продавца удаляет БД (ON DELETE CASCADE)
+    await invalidate_cache(session, SellerJWT, BookJWT)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-@seller_jwt_router.get("/sellers/list", response_model=ReturnedAllSellersJWT)
+@seller_jwt_router.get(
+    "/sellers/list", response_model=ReturnedAllSellersJWT, responses=SPARSE_RESPONSES
+)
 async def get_all_sellers_jwt(
-    session=Depends(get_async_session),
+    request: Request,
+    columns: SellerFields,
+    page: PageParams = Depends(),
+    session=Depends(get_async_read_session),
 ):
     """
-    Handle to get list of all sellers
+    Handle to get page of sellers (ordered by id, use next_cursor to get next page).
+    With `fields` only the listed columns (and id) are selected and returned.
     """
-    res = await session.execute(select(SellerJWT))
-    sellers = res.scalars().all()
-
-    return {"sellers": sellers}
+    return await cached_json_response(
+        request,
+        SellerJWT,
+        ("list", page.limit, page.after, fields_key(columns)),
+        lambda: load_page_json(session, "sellers", columns, page),
+    )
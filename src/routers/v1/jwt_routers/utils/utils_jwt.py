@@ -1,18 +1,31 @@
-from fastapi import Depends, Form, status, HTTPException
+import logging
+import math
+from typing import Callable
+
+import jwt
+import orjson
+from fastapi import BackgroundTasks, Depends, Form, Request, status, HTTPException
 from pydantic import EmailStr
 
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 # from icecream import ic
-from sqlalchemy import select
-from sqlalchemy.orm import load_only
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND
 
-from src.configurations.database import get_async_session
+from src.configurations.database import (
+    get_async_read_session,
+    get_async_session,
+    get_async_session_maker,
+)
 from src.configurations.auth import utils as auth_utils
+from src.configurations.auth.passwords import PasswordHasherBusy
+from src.configurations.cache import response_cache
+from src.configurations.rate_limit import RateLimited, email_rate_limiter, ip_rate_limiter
+from src.configurations.settings import settings
 
-from src.models.books_jwt import BookJWT
 from src.models.sellers_jwt import SellerJWT
 
 from src.schemas import (
@@ -20,10 +33,44 @@ from src.schemas import (
     SignInSellerJWT,
 )
 
+from ...utils.json_reads import load_row_json
+from ...utils.seller_with_books import get_seller_with_books
+
+logger = logging.getLogger(__name__)
+
 http_bearer = HTTPBearer()
 
 
+def password_hasher_busy_exc() -> HTTPException:
+    """
+    All bcrypt workers and their queue are busy: the client should retry later
+    """
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login attempts, try again later",
+        headers={"Retry-After": str(settings.password_hash_retry_after)},
+    )
+
+
+async def check_auth_rate_limits(request: Request, email: str) -> None:
+    """
+    Take a login/signup attempt from the buckets of the client IP and of the email.
+    Runs before any DB query and bcrypt work: rejected attempts cost almost nothing.
+    """
+    client_host = request.client.host if request.client else "unknown"
+    try:
+        await ip_rate_limiter.check(f"auth:ip:{client_host}")
+        await email_rate_limiter.check(f"auth:email:{email.lower()}")
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+
+
 async def validate_registration_user(
+    request: Request,
     email: EmailStr = Form(),
     password: str = Form(),
     first_name: str = Form(default="None"),
@@ -35,6 +82,7 @@ async def validate_registration_user(
         Check if there is info about seller in DB
         Check if password is not None
     """
+    await check_auth_rate_limits(request, email)
 
     if seller := await session.execute(select(SellerJWT).where(SellerJWT.email == email)):
         if seller.scalars().first() != None:
@@ -77,28 +125,84 @@ async def validate_registration_user(
     return new_seller
 
 
+async def rehash_password(
+    session_maker: Callable[[], AsyncSession],
+    seller_id: int,
+    password: str,
+    old_hashed_password: bytes,
+) -> None:
+    """
+    Replace seller's password hash with a hash of the configured cost.
+    Runs after the login response is sent.
+    """
+    try:
+        hashed_password = await auth_utils.password_hasher.hash(password)
+    except PasswordHasherBusy:
+        # Пул занят входами - пересчитаем при следующем входе
+        return
+
+    try:
+        async with session_maker() as session:
+            # Только если хеш не сменился, пока считали новый (например, сменили пароль)
+            await session.execute(
+                update(SellerJWT)
+                .where(SellerJWT.id == seller_id, SellerJWT.password == old_hashed_password)
+                .values(password=hashed_password)
+            )
+            await session.commit()
+    except Exception as e:
+        logger.error("Password of seller %s is not rehashed: %r", seller_id, e)
+
+
 async def validate_auth_user(
+    request: Request,
+    background_tasks: BackgroundTasks,
     email: EmailStr = Form(),
     password: str = Form(),
-    session=Depends(get_async_session),
+    session=Depends(get_async_read_session),
+    session_maker=Depends(get_async_session_maker),
 ) -> LogInSellerJWT:
     """
     User validation for login:
         Check if there is info about seller in DB
         Check if password is correct
+        Rehash password after the response if its bcrypt cost is not the configured one
     """
     unauthed_exc = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid email or password",
     )
 
-    if login_seller := await session.execute(select(SellerJWT).where(SellerJWT.email == email)):
-        login_seller = login_seller.scalars().first()
-        if auth_utils.validate_password(
+    await check_auth_rate_limits(request, email)
+
+    login_seller = await session.execute(select(SellerJWT).where(SellerJWT.email == email))
+    login_seller = login_seller.scalars().first()
+
+    try:
+        # bcrypt в пуле потоков: event loop в это время обслуживает другие запросы
+        if login_seller is None:
+            # Неизвестный email проверяется так же долго, как известный:
+            # по времени ответа нельзя узнать, есть ли такой продавец
+            await auth_utils.password_hasher.verify_unknown(password)
+            raise unauthed_exc
+
+        password_is_valid = await auth_utils.password_hasher.verify(
             password=password,
             hashed_password=login_seller.password,
-        ):
-            return login_seller
+        )
+    except PasswordHasherBusy:
+        raise password_hasher_busy_exc()
+
+    if password_is_valid:
+        if auth_utils.password_hasher.needs_rehash(login_seller.password):
+            background_tasks.add_task(
+                rehash_password,
+                session_maker,
+                login_seller.id,
+                password,
+                login_seller.password,
+            )
+        return login_seller
 
     raise unauthed_exc
 
@@ -108,12 +212,16 @@ async def get_current_token_payload(
 ) -> LogInSellerJWT:
     """
     Get payload from token
+    (signature of the same token is checked once, then payload is taken from cache)
     """
     token = credentials.credentials
 
-    payload = auth_utils.decode_jwt(
-        token=token,
-    )
+    try:
+        payload = auth_utils.decode_jwt_cached(
+            token=token,
+        )
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="token invalid")
 
     return payload
 
@@ -135,9 +243,34 @@ async def get_current_auth_seller(
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="token invalid")
 
 
+async def get_current_auth_seller_id(
+    payload: dict = Depends(get_current_token_payload),
+    session=Depends(get_async_read_session),
+) -> int:
+    """
+    Get id of the seller from token payload and check that the seller exists.
+    The check is cached until the next write to the sellers table,
+    so handlers which need only the id make no DB query.
+    """
+    seller_id: int | None = payload.get("seller_id")
+
+    # Сессия берет соединение только при первом запросе, при попадании в кеш его нет.
+    # Версия - общая для таблицы: свое пространство имен на продавца копило бы версии без конца
+    if seller_id is not None and (
+        identity := await response_cache.get_or_load(
+            SellerJWT,
+            ("identity", seller_id),
+            lambda: load_row_json(session, [SellerJWT.id, SellerJWT.email], seller_id),
+        )
+    ):
+        return orjson.loads(identity)["id"]
+
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="token invalid")
+
+
 async def get_current_auth_seller_full(
     payload: dict = Depends(get_current_token_payload),
-    session=Depends(get_async_session),
+    session=Depends(get_async_read_session),
 ):
     """
     Get full info (with seller's books) about user from DB with using token payload
@@ -146,28 +279,8 @@ async def get_current_auth_seller_full(
 
     seller_id: int | None = payload.get("seller_id")
 
-    seller = await session.get(SellerJWT, seller_id)
-    # Get seller's books by seller_id
-    book_cols_to_select = [
-        BookJWT.id,
-        BookJWT.title,
-        BookJWT.author,
-        BookJWT.year,
-        BookJWT.count_pages,
-    ]
-    books = await session.execute(
-        select(BookJWT)
-        .filter_by(seller_id=seller_id)
-        .options(
-            load_only(*book_cols_to_select),
-        )
-    )
-
-    res = {}
-    res["id"] = seller.id
-    res["first_name"] = seller.first_name
-    res["second_name"] = seller.second_name
-    res["email"] = seller.email
-    res["books"] = books.scalars().all()
+    # Seller and its books in one query
+    if seller := await get_seller_with_books(session, SellerJWT, seller_id):
+        return seller
 
-    return res
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="token invalid")
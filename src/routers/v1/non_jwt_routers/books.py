@@ -1,21 +1,57 @@
-from typing import Annotated
+from operator import itemgetter
+from typing import Annotated, Any, Callable
 
-from fastapi import APIRouter, Depends, Response, status
+from fastapi import APIRouter, Body, Depends, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from icecream import ic
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.configurations.database import get_async_session
+from src.configurations.cache import invalidate_cache
+from src.configurations.database import (
+    get_async_read_session,
+    get_async_read_session_maker,
+    get_async_session,
+)
+from src.configurations.settings import settings
 from src.models.books import Book
-
-# from src.models.sellers import Seller
-
-from src.schemas import IncomingBook, ReturnedAllBooks, ReturnedBook
-
-books_router = APIRouter(tags=["nonJWT"], prefix="/nonjwt/books")
+from src.models.sellers import Seller
+
+from src.schemas import (
+    IncomingBook,
+    ReturnedAllBooks,
+    ReturnedBook,
+    ReturnedBooksImport,
+    ReturnedBulkBooks,
+)
+
+from ..utils.bulk import filter_existing_sellers, insert_in_batches, validate_items
+from ..utils.csv_import import import_csv
+from ..utils.export import NDJSON_MEDIA_TYPE, ndjson_export_response
+from ..utils.fields import SPARSE_RESPONSES, FieldsParams, fields_key
+from ..utils.json_reads import cached_json_response, load_page_json, load_row_json
+from ..utils.msgpack_support import MsgpackRoute
+from ..utils.pagination import PageParams
+from ..utils.trusted_output import trusted_json_response
+
+# MsgpackRoute: тело запросов (например, массового создания) можно передать и в msgpack
+books_router = APIRouter(tags=["nonJWT"], prefix="/nonjwt/books", route_class=MsgpackRoute)
 
 # Больше не симулируем хранилище данных. Подключаемся к реальному, через сессию.
 DBSession = Annotated[AsyncSession, Depends(get_async_session)]
+# Сессия только для чтения (READ ONLY транзакция, без commit) - для ручек, которые ничего не пишут
+ReadSession = Annotated[AsyncSession, Depends(get_async_read_session)]
+# Фабрика сессий только для чтения для ручек, которые читают БД уже после выхода
+# из обработчика (стриминг). Как и ReadSession, ходит в реплики.
+ReadSessionMaker = Annotated[Callable[[], AsyncSession], Depends(get_async_read_session_maker)]
+# Колонки книги, выбранные параметром fields (по умолчанию все)
+BookFields = Annotated[
+    list,
+    Depends(
+        FieldsParams(
+            [Book.id, Book.seller_id, Book.title, Book.author, Book.year, Book.count_pages]
+        )
+    ),
+]
 
 
 # Ручка для создания записи о книге в БД. Возвращает созданную книгу.
@@ -37,26 +73,112 @@ async def create_book(
     )
     session.add(new_book)
     await session.flush()
+    await invalidate_cache(session, Book)
+
+    return trusted_json_response(ReturnedBook, new_book, status.HTTP_201_CREATED)
+
+
+# Ручка для массового создания книг (например, загрузка всего склада продавца).
+# Книги вставляются пачками многострочным INSERT ... RETURNING, а не по одной.
+# Невалидные книги не ломают весь запрос: они попадают в errors с позицией во входящем списке.
+@books_router.post(
+    "/bulk",
+    response_model=ReturnedBulkBooks,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_books_bulk(
+    books: Annotated[list[Any], Body(max_length=settings.bulk_max_items)],
+    session: DBSession,
+):
+    valid, errors = validate_items(books, IncomingBook)
+
+    rows = [(index, book.model_dump()) for index, book in valid]
+    rows, seller_errors = await filter_existing_sellers(session, Seller, rows)
+
+    created, db_errors = await insert_in_batches(
+        session,
+        Book,
+        rows,
+        [Book.id, Book.seller_id, Book.title, Book.author, Book.year, Book.count_pages],
+    )
+
+    if created:
+        await invalidate_cache(session, Book)
+
+    errors = sorted(errors + seller_errors + db_errors, key=itemgetter("index"))
+    return trusted_json_response(
+        ReturnedBulkBooks, {"books": created, "errors": errors}, status.HTTP_201_CREATED
+    )
+
+
+# Ручка для импорта книг поставщика из CSV (колонки как у IncomingBook: seller_id, title,
+# author, year, pages). Файл читается и валидируется пачками, строки грузятся через COPY.
+# В ответе - сколько строк загружено и отвергнуто, скорость и пиковая память.
+@books_router.post(
+    "/import",
+    response_model=ReturnedBooksImport,
+    status_code=status.HTTP_201_CREATED,
+)
+async def import_books_csv(file: UploadFile, session: DBSession):
+    report = await import_csv(
+        session,
+        file,
+        IncomingBook,
+        Book,
+        Seller,
+        ["seller_id", "title", "author", "year", "count_pages"],
+    )
+    if report["rows_imported"]:
+        await invalidate_cache(session, Book)
 
-    return new_book
+    return report
 
 
 # Ручка, возвращающая все книги
-@books_router.get("/", response_model=ReturnedAllBooks)
-async def get_all_books(session: DBSession):
+@books_router.get("/", response_model=ReturnedAllBooks, responses=SPARSE_RESPONSES)
+async def get_all_books(
+    request: Request,
+    session: ReadSession,
+    columns: BookFields,
+    page: PageParams = Depends(),
+):
     # Хотим видеть формат:
-    # books: [{"id": 1, "title": "Blabla", ...}, {"id": 2, ...}]
-    query = select(Book)
-    res = await session.execute(query)
-    books = res.scalars().all()
-    return {"books": books}
+    # books: [{"id": 1, "title": "Blabla", ...}, {"id": 2, ...}], next_cursor: 2
+    # Страница кешируется уже сериализованной, при попадании в кеш БД не трогаем.
+    # С совпавшим If-None-Match клиент получает 304 без тела.
+    # С ?fields=title,author из БД читаются и в ответ попадают только эти колонки (и id).
+    return await cached_json_response(
+        request,
+        Book,
+        ("list", page.limit, page.after, fields_key(columns)),
+        lambda: load_page_json(session, "books", columns, page),
+    )
+
+
+# Ручка для выгрузки всего каталога книг потоком NDJSON (одна книга - одна строка JSON).
+# Строки читаются серверным курсором, поэтому память не растет с размером таблицы.
+# Должна быть объявлена раньше "/{book_id}", иначе "export" попадет в book_id.
+@books_router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def export_books(session_maker: ReadSessionMaker, columns: BookFields):
+    return ndjson_export_response(session_maker, columns)
 
 
 # Ручка для получения книги по ее ИД
-@books_router.get("/{book_id}", response_model=ReturnedBook)
-async def get_book(book_id: int, session: DBSession):
-    res = await session.get(Book, book_id)
-    return res
+@books_router.get("/{book_id}", response_model=ReturnedBook, responses=SPARSE_RESPONSES)
+async def get_book(book_id: int, request: Request, session: ReadSession, columns: BookFields):
+    if response := await cached_json_response(
+        request,
+        Book,
+        ("id", book_id, fields_key(columns)),
+        lambda: load_row_json(session, columns, book_id),
+    ):
+        return response
+
+    return Response(status_code=status.HTTP_404_NOT_FOUND)
 
 
 # Ручка для удаления книги
@@ -66,6 +188,7 @@ async def delete_book(book_id: int, session: DBSession):
     ic(deleted_book)  # Красивая и информативная замена для print. Полезна при отладке.
     if deleted_book:
         await session.delete(deleted_book)
+        await invalidate_cache(session, Book)
 
     return Response(
         status_code=status.HTTP_204_NO_CONTENT
@@ -84,6 +207,7 @@ async def update_book(book_id: int, new_data: IncomingBook, session: DBSession):
         updated_book.count_pages = new_data.count_pages
 
         await session.flush()
+        await invalidate_cache(session, Book)
 
         return updated_book
 
@@ -1,14 +1,12 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Response, status
+from fastapi import APIRouter, Depends, Request, Response, status
 
 # from icecream import ic
-from sqlalchemy import select
-from sqlalchemy.orm import load_only
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.configurations.database import get_async_session
-
+from src.configurations.cache import invalidate_cache
+from src.configurations.database import get_async_read_session, get_async_session
 from src.models.books import Book
 from src.models.sellers import Seller
 
@@ -20,11 +18,24 @@ from src.schemas import (
     ReturnedSellerFull,
 )
 
+from ..utils.fields import SPARSE_RESPONSES, FieldsParams, fields_key
+from ..utils.json_reads import cached_json_response, etag_json_response, load_page_json
+from ..utils.pagination import PageParams
+from ..utils.seller_with_books import get_seller_with_books
+from ..utils.trusted_output import json_bytes, trusted_json_response
+
 
 sellers_router = APIRouter(tags=["nonJWT"], prefix="/nonjwt/sellers")
 
 # Больше не симулируем хранилище данных. Подключаемся к реальному, через сессию.
 DBSession = Annotated[AsyncSession, Depends(get_async_session)]
+# Сессия только для чтения (READ ONLY транзакция, без commit) - для ручек, которые ничего не пишут
+ReadSession = Annotated[AsyncSession, Depends(get_async_read_session)]
+# Колонки продавца, выбранные параметром fields (по умолчанию все)
+SellerFields = Annotated[
+    list,
+    Depends(FieldsParams([Seller.id, Seller.first_name, Seller.second_name, Seller.email])),
+]
 
 
 @sellers_router.post("/", response_model=ReturnedSeller, status_code=status.HTTP_201_CREATED)
@@ -41,53 +52,40 @@ async def create_seller(seller: IncomingSeller, session: DBSession):
 
     session.add(new_seller)
     await session.flush()
+    await invalidate_cache(session, Seller)
 
-    return new_seller
+    return trusted_json_response(ReturnedSeller, new_seller, status.HTTP_201_CREATED)
 
 
-@sellers_router.get("/", response_model=ReturnedAllSellers)
-async def get_all_sellers(session: DBSession):
+@sellers_router.get("/", response_model=ReturnedAllSellers, responses=SPARSE_RESPONSES)
+async def get_all_sellers(
+    request: Request,
+    session: ReadSession,
+    columns: SellerFields,
+    page: PageParams = Depends(),
+):
     """
-    Handle to get list of all sellers
+    Handle to get page of sellers (ordered by id, use next_cursor to get next page).
+    With `fields` only the listed columns (and id) are selected and returned.
     """
-    query = select(Seller)
-    res = await session.execute(query)
-    sellers = res.scalars().all()
-
-    return {"sellers": sellers}
+    # Строки уже в формате ReturnedSeller - отдаем байты сразу, без повторной валидации
+    return await cached_json_response(
+        request,
+        Seller,
+        ("list", page.limit, page.after, fields_key(columns)),
+        lambda: load_page_json(session, "sellers", columns, page),
+    )
 
 
 @sellers_router.get("/{seller_id}", response_model=ReturnedSellerFull)
-async def get_seller(seller_id: int, session: DBSession):
+async def get_seller(seller_id: int, request: Request, session: ReadSession):
     """
     Handle to get information about seller with its books
     """
-    if seller := await session.get(Seller, seller_id):
-
-        # Get seller's books by seller_id
-        book_cols_to_select = [
-            Book.id,
-            Book.title,
-            Book.author,
-            Book.year,
-            Book.count_pages,
-        ]
-        books = await session.execute(
-            select(Book)
-            .filter_by(seller_id=seller_id)
-            .options(
-                load_only(*book_cols_to_select),
-            )
-        )
-
-        res = {}
-        res["id"] = seller.id
-        res["first_name"] = seller.first_name
-        res["second_name"] = seller.second_name
-        res["email"] = seller.email
-        res["books"] = books.scalars().all()
-
-        return res
+    # Seller and its books in one query. Ответ зависит от двух таблиц и в кеш ответов
+    # (пространства имен по одной таблице) не кладется, но отдается с ETag
+    if seller := await get_seller_with_books(session, Seller, seller_id):
+        return etag_json_response(request, json_bytes(ReturnedSellerFull, seller))
 
     return Response(status_code=status.HTTP_404_NOT_FOUND)
 
@@ -103,8 +101,9 @@ async def update_seller(seller_id: int, new_data: UpdateSellerData, session: DBS
         updated_seller.email = new_data.email
 
         await session.flush()
+        await invalidate_cache(session, Seller)
 
-        return updated_seller
+        return trusted_json_response(ReturnedSeller, updated_seller)
 
     return Response(status_code=status.HTTP_404_NOT_FOUND)
 
@@ -118,6 +117,8 @@ async def delete_book(seller_id: int, session: DBSession):
         # ic(deleted_seller)
         if deleted_seller:
             await session.delete(deleted_seller)
+            # Книги продавца удаляет БД (ON DELETE CASCADE)
+            await invalidate_cache(session, Seller, Book)
 
         return Response(
             status_code=status.HTTP_204_NO_CONTENT
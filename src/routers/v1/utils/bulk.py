@@ -0,0 +1,120 @@
+from typing import Any
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations.settings import settings
+
+
+def _item_error(index: int, loc: tuple, msg: str, error_type: str) -> dict:
+    return {"index": index, "detail": [{"loc": list(loc), "msg": msg, "type": error_type}]}
+
+
+def validate_items(
+    items: list[Any],
+    schema: type[BaseModel],
+) -> tuple[list[tuple[int, BaseModel]], list[dict]]:
+    """
+    Validate every item of incoming list against schema in one pass.
+
+    Returns valid items with their positions in the list and errors of the rest
+    (invalid items do not fail the whole request).
+    """
+    valid, errors = [], []
+
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as e:
+            errors.append(
+                {
+                    "index": index,
+                    "detail": e.errors(
+                        include_url=False, include_context=False, include_input=False
+                    ),
+                }
+            )
+
+    return valid, errors
+
+
+async def filter_existing_sellers(
+    session: AsyncSession,
+    seller_model,
+    rows: list[tuple[int, dict]],
+) -> tuple[list[tuple[int, dict]], list[dict]]:
+    """
+    Drop rows with unknown seller_id using one query for the whole list
+    (otherwise foreign key violation would fail the entire INSERT)
+    """
+    seller_ids = {values["seller_id"] for _, values in rows}
+    if not seller_ids:
+        return rows, []
+
+    res = await session.execute(select(seller_model.id).where(seller_model.id.in_(seller_ids)))
+    existing_ids = set(res.scalars().all())
+
+    kept, errors = [], []
+    for index, values in rows:
+        if values["seller_id"] in existing_ids:
+            kept.append((index, values))
+        else:
+            errors.append(
+                _item_error(index, ("seller_id",), "Seller does not exist", "not_found")
+            )
+
+    return kept, errors
+
+
+async def _insert_batch(
+    session: AsyncSession,
+    model,
+    batch: list[tuple[int, dict]],
+    returning: list,
+    created: list[dict],
+    errors: list[dict],
+) -> None:
+    try:
+        # Каждая пачка в своем SAVEPOINT, чтобы ошибка не откатила уже вставленные пачки
+        async with session.begin_nested():
+            res = await session.execute(
+                # sort_by_parameter_order - строки RETURNING идут в порядке входного списка
+                insert(model).returning(*returning, sort_by_parameter_order=True),
+                [values for _, values in batch],
+            )
+            created.extend(dict(row) for row in res.mappings())
+    except DBAPIError as e:
+        if len(batch) == 1:
+            msg = str(e.orig) if e.orig is not None else str(e)
+            errors.append(_item_error(batch[0][0], (), msg, "db_error"))
+            return
+
+        # Делим пачку пополам, пока не найдем строки, которые отвергает БД
+        middle = len(batch) // 2
+        await _insert_batch(session, model, batch[:middle], returning, created, errors)
+        await _insert_batch(session, model, batch[middle:], returning, created, errors)
+
+
+async def insert_in_batches(
+    session: AsyncSession,
+    model,
+    rows: list[tuple[int, dict]],
+    returning: list,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Insert rows with multi-row `INSERT ... VALUES (...), (...) RETURNING ...`
+    by `bulk_insert_batch_size` rows per statement.
+
+    If the DB rejects a batch, it is split in halves and retried, so only
+    the offending rows are reported as errors and the rest is still inserted.
+    """
+    created, errors = [], []
+    batch_size = settings.bulk_insert_batch_size
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        await _insert_batch(session, model, batch, returning, created, errors)
+
+    return created, errors
@@ -0,0 +1,214 @@
+import codecs
+import csv
+import os
+import time
+from itertools import islice
+from typing import BinaryIO, Callable, Iterator, TypeVar
+
+import asyncpg
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations.database import mark_session_written
+from src.configurations.settings import settings
+
+from .bulk import filter_existing_sellers
+
+T = TypeVar("T")
+
+
+class _UndecodableLine(Exception):
+    pass
+
+
+def _decode_lines(binary: BinaryIO) -> Iterator[str]:
+    # Декодируем по строкам файла (в UTF-8 байт \n не бывает частью другого символа),
+    # чтобы ошибка декодирования указывала номер строки
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    for line, data in enumerate(binary, start=1):
+        try:
+            yield decoder.decode(data)
+        except UnicodeDecodeError as e:
+            raise _UndecodableLine(f"CSV line {line} is not valid UTF-8: {e.reason}") from e
+
+
+async def _read_csv(reader: csv.DictReader, read: Callable[[], T]) -> T:
+    # Файл читается в тредпуле. Нечитаемый файл (не UTF-8, поле больше лимита csv) - 422
+    # с номером строки; транзакция запроса откатывается вместе с уже загруженными пачками.
+    # Номер строки берем у самого csv.reader: DictReader обновляет его только после
+    # успешно прочитанной строки.
+    try:
+        return await run_in_threadpool(read)
+    except _UndecodableLine as e:
+        detail = str(e)
+    except csv.Error as e:
+        detail = f"CSV line {reader.reader.line_num} can not be parsed: {e}"
+    raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
+
+
+def _numbered_rows(reader: csv.DictReader) -> Iterator[tuple[int, dict]]:
+    for row in reader:
+        yield reader.line_num, row
+
+
+async def _copy_chunk(
+    session: AsyncSession,
+    table_name: str,
+    columns: list[str],
+    records: list[tuple],
+) -> None:
+    # COPY идет через драйвер asyncpg напрямую, но в той же транзакции, что и сессия
+    mark_session_written(session)
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        table_name,
+        records=records,
+        columns=columns,
+    )
+
+
+# Ошибки строк при COPY: от БД, и от драйвера - значение не кодируется в тип колонки
+# (например, число вне диапазона INTEGER asyncpg отвергает OverflowError)
+_COPY_ERRORS = (
+    DBAPIError,
+    asyncpg.PostgresError,
+    asyncpg.InterfaceError,
+    OverflowError,
+    ValueError,
+    TypeError,
+)
+
+
+async def _copy_batch(
+    session: AsyncSession,
+    table_name: str,
+    columns: list[str],
+    batch: list[tuple[int, tuple]],
+    rejected: list[tuple[int, str]],
+) -> int:
+    # Возвращает, сколько строк загружено; отвергнутые БД строки - в rejected (строка файла, ошибка)
+    try:
+        # Каждая пачка в своем SAVEPOINT, чтобы ошибка не откатила уже загруженные
+        async with session.begin_nested():
+            await _copy_chunk(session, table_name, columns, [record for _, record in batch])
+        return len(batch)
+    except _COPY_ERRORS as e:
+        if len(batch) == 1:
+            rejected.append((batch[0][0], str(getattr(e, "orig", None) or e)))
+            return 0
+
+        # COPY отвергает пачку целиком: делим ее пополам, пока не найдем плохие строки
+        middle = len(batch) // 2
+        return await _copy_batch(
+            session, table_name, columns, batch[:middle], rejected
+        ) + await _copy_batch(session, table_name, columns, batch[middle:], rejected)
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _current_rss() -> int | None:
+    # Текущий RSS процесса из /proc (Linux): дешевле tracemalloc и видит буферы asyncpg и C.
+    # ru_maxrss не подходит - это пик за всю жизнь процесса, а не за импорт.
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return None
+
+
+async def import_csv(
+    session: AsyncSession,
+    file: UploadFile,
+    schema: type[BaseModel],
+    model,
+    seller_model,
+    columns: list[str],
+) -> dict:
+    """
+    Load books from CSV upload into the model table with Postgres COPY.
+
+    The file is read and validated by chunks of `import_chunk_size` rows,
+    so memory does not depend on the file size. Invalid rows and rows of
+    unknown sellers are skipped and reported (first `import_max_reported_errors`).
+    Rows rejected by the DB are found by splitting the failed chunk in halves,
+    so the rest of the chunk is still loaded. A file which can not be read
+    (not UTF-8, broken CSV) is rejected with 422 naming the line.
+
+    Peak memory is the largest growth of the worker RSS over its value at the start,
+    sampled after each chunk (None where RSS is not available). It is per worker,
+    so concurrent requests are counted too.
+    """
+    started = time.perf_counter()
+    rss_before = _current_rss()
+    memory_peak = 0
+
+    # Starlette уже сохранил загрузку во временный файл, читаем его потоково в тредпуле
+    reader = csv.DictReader(_decode_lines(file.file))
+    fieldnames = await _read_csv(reader, lambda: reader.fieldnames)
+    required = [name for name, field in schema.model_fields.items() if field.is_required()]
+    if fieldnames is None or not set(required) <= set(fieldnames):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"CSV header must contain columns: {', '.join(required)}",
+        )
+
+    rows = _numbered_rows(reader)
+    rows_total = rows_imported = rows_rejected = 0
+    errors = []
+
+    def reject(line: int, detail: list[dict]) -> None:
+        nonlocal rows_rejected
+        rows_rejected += 1
+        if len(errors) < settings.import_max_reported_errors:
+            errors.append({"line": line, "detail": detail})
+
+    while chunk := await _read_csv(
+        reader, lambda: list(islice(rows, settings.import_chunk_size))
+    ):
+        rows_total += len(chunk)
+
+        valid = []
+        for line, row in chunk:
+            try:
+                valid.append((line, schema.model_validate(row).model_dump()))
+            except ValidationError as e:
+                reject(
+                    line,
+                    e.errors(include_url=False, include_context=False, include_input=False),
+                )
+
+        valid, seller_errors = await filter_existing_sellers(session, seller_model, valid)
+        for error in seller_errors:
+            reject(error["index"], error["detail"])
+
+        if not valid:
+            continue
+
+        batch = [(line, tuple(values[column] for column in columns)) for line, values in valid]
+        db_rejected = []
+        rows_imported += await _copy_batch(
+            session, model.__tablename__, columns, batch, db_rejected
+        )
+        for line, msg in db_rejected:
+            reject(line, [{"loc": [], "msg": msg, "type": "db_error"}])
+
+        # После COPY пачка еще в памяти - здесь потребление за пачку наибольшее
+        if rss_before is not None:
+            memory_peak = max(memory_peak, _current_rss() - rss_before)
+
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rows_total": rows_total,
+        "rows_imported": rows_imported,
+        "rows_rejected": rows_rejected,
+        "errors": errors,
+        "elapsed_seconds": elapsed,
+        "rows_per_second": rows_imported / elapsed if elapsed else 0.0,
+        "peak_memory_bytes": memory_peak if rss_before is not None else None,
+    }
@@ -0,0 +1,42 @@
+from typing import AsyncIterator, Callable
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations.settings import settings
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def _stream_rows(
+    session_maker: Callable[[], AsyncSession],
+    columns: list,
+) -> AsyncIterator[bytes]:
+    # Сессия открывается внутри генератора: зависимости запроса закрываются
+    # до того, как начнет отдаваться тело StreamingResponse.
+    async with session_maker() as session:
+        query = (
+            select(*columns)
+            .order_by(columns[0])
+            .execution_options(yield_per=settings.export_chunk_size)
+        )
+        # stream() открывает серверный курсор, в памяти лежит не больше одной пачки строк
+        result = await session.stream(query)
+        async for partition in result.mappings().partitions():
+            yield b"".join(orjson.dumps(dict(row)) + b"\n" for row in partition)
+
+
+def ndjson_export_response(
+    session_maker: Callable[[], AsyncSession],
+    columns: list,
+) -> StreamingResponse:
+    """
+    Stream all rows of selected columns ordered by the first one
+    as newline-delimited JSON (one object per line)
+    """
+    return StreamingResponse(
+        _stream_rows(session_maker, columns),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
@@ -0,0 +1,60 @@
+from typing import Sequence
+
+from fastapi import HTTPException, Query, status
+
+# Для OpenAPI: response_model описывает полный ответ, с fields в нем только часть ключей
+SPARSE_RESPONSES = {
+    200: {
+        "description": "Successful Response. With `fields` the objects contain only `id` "
+        "and the listed fields, the other fields of the schema are omitted."
+    }
+}
+
+
+class FieldsParams:
+    """
+    Sparse fieldsets: `?fields=title,author` selects only these columns.
+
+    Dependency returns the chosen columns (all of them without `fields`) in the order
+    of `columns`. The first column (id) is always selected: by it rows are looked up
+    and the next page cursor is built. Unknown names and empty `fields` are rejected
+    with 422.
+    """
+
+    def __init__(self, columns: Sequence) -> None:
+        self.columns = list(columns)
+        self.names = [column.key for column in self.columns]
+
+    def __call__(
+        self,
+        fields: str | None = Query(
+            default=None,
+            description="Comma-separated fields to return (id is always returned), "
+            "other fields are omitted from the response",
+        ),
+    ) -> list:
+        if fields is None:
+            return self.columns
+
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        if not requested:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"No fields given. Available: {', '.join(self.names)}",
+            )
+        if unknown := requested.difference(self.names):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}. "
+                f"Available: {', '.join(self.names)}",
+            )
+
+        id_column, *columns = self.columns
+        return [id_column, *(column for column in columns if column.key in requested)]
+
+
+def fields_key(columns: Sequence) -> tuple:
+    """
+    Part of the cache key for the chosen columns
+    """
+    return tuple(column.key for column in columns)
@@ -0,0 +1,138 @@
+import hashlib
+from typing import Awaitable, Callable, Sequence
+
+import orjson
+from fastapi import Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations.cache import response_cache
+from src.configurations.database import is_pinned_to_primary
+from src.configurations.settings import settings
+
+from .msgpack_support import MSGPACK_MEDIA_TYPE, json_to_msgpack, wants_msgpack
+from .pagination import PageParams, fetch_page
+
+
+def json_response(
+    content: bytes,
+    headers: dict[str, str] | None = None,
+    media_type: str = "application/json",
+) -> Response:
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def body_etag(content: bytes) -> str:
+    """
+    Strong ETag of the response body: the same in every worker for the same bytes
+    """
+    return f'"{hashlib.blake2b(content, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check If-None-Match header (`*` or list of ETags, weak ones too) against `etag`
+    of an existing resource
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def etag_json_response(
+    request: Request,
+    content: bytes,
+    media_type: str = "application/json",
+    private: bool = False,
+) -> Response:
+    """
+    Response with `content` and its ETag, 304 without body if the client already has it
+    (If-None-Match). `private` responses (of the authorized client) are not stored
+    by shared caches.
+    """
+    etag = body_etag(content)
+    headers = {"ETag": etag, "Cache-Control": settings.http_cache_control, "Vary": "Accept"}
+    if private:
+        headers["Cache-Control"] = f"private, {settings.http_cache_control}"
+        headers["Vary"] = "Accept, Authorization"
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return json_response(content, headers, media_type)
+
+
+async def cached_json_response(
+    request: Request,
+    model,
+    key: tuple,
+    loader: Callable[[], Awaitable[bytes | None]],
+) -> Response | None:
+    """
+    Response with JSON body from the response cache (`loader` is called on cache miss),
+    None if `loader` found nothing.
+
+    Body is sent with ETag (hash of the body). If the client already has it
+    (If-None-Match), 304 is returned without the body; when the body is cached,
+    DB is not queried at all. ETag is checked only after the resource is found,
+    so `If-None-Match: *` for a missing one still gets 404.
+    Bytes are built from columns that were validated on write, so FastAPI
+    validation against response_model (which stays for docs) is skipped.
+
+    Clients which prefer msgpack (Accept) get the same data in msgpack,
+    it is cached separately from JSON and has its own ETag.
+
+    Clients pinned to primary after their own writes bypass the cache: they must
+    see their writes even if the cache is not invalidated yet in this worker.
+    """
+    media_type = "application/json"
+    if wants_msgpack(request):
+        media_type = MSGPACK_MEDIA_TYPE
+        key = (*key, "msgpack")
+        json_loader = loader
+
+        async def loader() -> bytes | None:
+            content = await json_loader()
+            return json_to_msgpack(content) if content is not None else None
+
+    # Клиент после записи или без версии (хранилище кеша недоступно) - ответ прямо из БД
+    version = None if is_pinned_to_primary(request) else await response_cache.version(model)
+    if version is None:
+        content = await loader()
+    else:
+        content = await response_cache.get_or_load(model, key, loader, version)
+
+    if content is None:
+        return None
+
+    # ETag из самого тела, а не из версии кеша: у каждого воркера с кешем в памяти
+    # свои версии, и запись в другом воркере не поменяла бы ETag
+    return etag_json_response(request, content, media_type)
+
+
+async def load_row_json(session: AsyncSession, columns: Sequence, row_id: int) -> bytes | None:
+    """
+    Select one row by id (the first of `columns`) as JSON object bytes,
+    None if there is no such row
+    """
+    res = await session.execute(select(*columns).where(columns[0] == row_id))
+    row = res.mappings().first()
+
+    return orjson.dumps(dict(row)) if row is not None else None
+
+
+async def load_page_json(
+    session: AsyncSession,
+    name: str,
+    columns: Sequence,
+    page: PageParams,
+) -> bytes:
+    """
+    Select one page of rows as JSON bytes: `{name: [...], "next_cursor": ...}`
+    """
+    rows, next_cursor = await fetch_page(session, columns, page)
+
+    return orjson.dumps({name: rows, "next_cursor": next_cursor})
@@ -0,0 +1,119 @@
+"""
+Модуль с поддержкой MessagePack для внутренних клиентов каталога.
+
+Ответы ручек чтения отдаются в msgpack, если клиент просит его в Accept
+(application/msgpack) и предпочитает JSON'у; по умолчанию - JSON. Данные те же,
+что в JSON (те же схемы ответов), но меньше по размеру и быстрее разбираются.
+Ручки записи книг принимают тело в msgpack (Content-Type: application/msgpack).
+
+msgpack - необязательная зависимость (pip install msgpack). Без нее все работает
+как раньше: ответы в JSON, а тело в msgpack отклоняется с 415.
+"""
+
+from typing import Callable
+
+import orjson
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+
+try:
+    import msgpack
+except ImportError:  # msgpack не установлен - только JSON
+    msgpack = None
+
+__all__ = [
+    "MSGPACK_MEDIA_TYPE",
+    "MsgpackRoute",
+    "json_to_msgpack",
+    "wants_msgpack",
+]
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Названия, под которыми msgpack встречается у разных клиентов
+_MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+_JSON_MEDIA_TYPES = {"application/json", "application/*", "*/*"}
+
+
+def _media_type(value: str) -> str:
+    return value.split(";", 1)[0].strip().lower()
+
+
+def wants_msgpack(request: Request) -> bool:
+    """
+    Client accepts msgpack and prefers it to JSON (by q of the Accept header)
+    """
+    accept = request.headers.get("accept")
+    if msgpack is None or not accept:
+        return False
+
+    msgpack_q = json_q = 0.0
+    for item in accept.split(","):
+        media_type, *params = item.split(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+
+        if media_type in _MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in _JSON_MEDIA_TYPES:
+            json_q = max(json_q, q)
+
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+def json_to_msgpack(content: bytes) -> bytes:
+    """
+    Re-encode JSON body as msgpack (same data shape)
+    """
+    return msgpack.packb(orjson.loads(content))
+
+
+class _MsgpackRequest(Request):
+    # Тело msgpack перекодируется в JSON: дальше FastAPI разбирает и валидирует его как обычно
+    async def body(self) -> bytes:
+        if not hasattr(self, "_json_body"):
+            try:
+                self._json_body = orjson.dumps(msgpack.unpackb(await super().body()))
+            except (ValueError, TypeError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid msgpack body",
+                )
+            self._body = self._json_body
+
+        return self._json_body
+
+
+class MsgpackRoute(APIRoute):
+    """
+    Route which also accepts request bodies in msgpack
+    """
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def msgpack_route_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type")
+            if content_type and _media_type(content_type) in _MSGPACK_MEDIA_TYPES:
+                if msgpack is None:
+                    return Response(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+                headers = [
+                    (name, value)
+                    for name, value in request.scope["headers"]
+                    if name != b"content-type"
+                ]
+                headers.append((b"content-type", b"application/json"))
+                request = _MsgpackRequest(
+                    {**request.scope, "headers": headers}, request.receive
+                )
+
+            return await route_handler(request)
+
+        return msgpack_route_handler
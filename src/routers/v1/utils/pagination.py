@@ -0,0 +1,57 @@
+from typing import Sequence
+
+from fastapi import Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations.settings import settings
+
+
+class PageParams:
+    """
+    Keyset (cursor) pagination params.
+
+    Page is selected by primary key: `WHERE id > after ORDER BY id LIMIT limit`,
+    so every page costs the same index range scan no matter how deep it is
+    (unlike OFFSET, which reads and throws away all previous rows).
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(default=settings.page_size_default, ge=1, le=settings.page_size_max),
+        after: int | None = Query(
+            default=None, ge=0, description="next_cursor of previous page"
+        ),
+    ):
+        self.limit = limit
+        self.after = after
+
+
+async def fetch_page(
+    session: AsyncSession,
+    columns: Sequence,
+    page: PageParams,
+) -> tuple[list[dict], int | None]:
+    """
+    Get one page of rows ordered by id (the first of `columns`) and cursor
+    of the next page (None if it is the last page).
+
+    Only the listed columns are selected with Core, rows come back as plain dicts:
+    no ORM instances and no identity map bookkeeping.
+    """
+    id_column = columns[0]
+    query = select(*columns).order_by(id_column).limit(page.limit + 1)
+    if page.after is not None:
+        query = query.where(id_column > page.after)
+
+    res = await session.execute(query)
+    keys = tuple(res.keys())
+    rows = [dict(zip(keys, row)) for row in res.tuples()]
+
+    # Берем на одну запись больше, чтобы без лишнего запроса понять, есть ли следующая страница
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        next_cursor = rows[-1]["id"]
+
+    return rows, next_cursor
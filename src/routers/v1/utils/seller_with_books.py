@@ -0,0 +1,55 @@
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def get_seller_with_books(
+    session: AsyncSession, seller_model, seller_id: int
+) -> dict | None:
+    """
+    Get seller with its books (ReturnedSellerFull shape) in one query.
+
+    Books are aggregated into JSON array by Postgres (LEFT JOIN + json_agg),
+    so there is one round trip and no ORM object per book.
+    Returns None if there is no such seller.
+    """
+    book_model = seller_model.books.property.mapper.class_
+
+    book_json = func.json_build_object(
+        "id",
+        book_model.id,
+        "title",
+        book_model.title,
+        "author",
+        book_model.author,
+        "year",
+        book_model.year,
+        "count_pages",
+        book_model.count_pages,
+    )
+    books = func.coalesce(
+        # FILTER отбрасывает пустую строку LEFT JOIN у продавца без книг
+        func.json_agg(aggregate_order_by(book_json, book_model.id)).filter(
+            book_model.id.is_not(None)
+        ),
+        literal_column("'[]'::json"),
+        type_=JSON,
+    )
+
+    query = (
+        select(
+            seller_model.id,
+            seller_model.first_name,
+            seller_model.second_name,
+            seller_model.email,
+            books.label("books"),
+        )
+        .outerjoin(seller_model.books)
+        .where(seller_model.id == seller_id)
+        .group_by(seller_model.id)
+    )
+
+    res = await session.execute(query)
+    row = res.mappings().first()
+
+    return dict(row) if row is not None else None
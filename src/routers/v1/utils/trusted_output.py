@@ -0,0 +1,123 @@
+"""
+Модуль с быстрой сериализацией ответов ("доверенный вывод").
+
+Если обработчик возвращает ORM объект или словарь, FastAPI заново валидирует его
+по response_model (создает pydantic модели), потом переводит в словари
+(jsonable_encoder) и только потом ORJSONResponse пишет JSON. Данные, взятые из наших
+же колонок, уже проверены при записи - здесь они сразу пишутся в JSON (orjson)
+по заранее построенному списку полей схемы. Лишние атрибуты (например, пароль
+продавца) в ответ не попадают: берутся только поля схемы.
+
+Поля, которого нет у объекта, нет и в ответе: обязательное поле - ошибка (как при
+валидации), у необязательного берется значение по умолчанию. Так расхождение схемы
+и данных не превращается молча в null.
+
+response_model у ручек остается - по нему строится OpenAPI схема.
+Режим включается настройкой trusted_output (по умолчанию выключен): без нее ручки
+отдают объекты как раньше, через валидацию FastAPI.
+"""
+
+import types
+from functools import lru_cache
+from typing import Any, Callable, Union, get_args, get_origin
+
+import orjson
+from fastapi import Response, status
+from pydantic import BaseModel
+
+from src.configurations.settings import settings
+
+__all__ = ["json_bytes", "serializer_for", "trusted_json_response"]
+
+# Значения нет (у объекта нет атрибута или у поля схемы нет значения по умолчанию)
+_MISSING = object()
+
+
+def _model_in(annotation) -> tuple[type[BaseModel] | None, bool]:
+    # (модель, список ли это) для полей вида Model, list[Model], Model | None
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _model_in(args[0]) if len(args) == 1 else (None, False)
+    if origin is list:
+        model, _ = _model_in(get_args(annotation)[0])
+        return model, model is not None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+
+    return None, False
+
+
+@lru_cache
+def _fields(schema: type[BaseModel]) -> tuple:
+    fields = []
+    for name, field in schema.model_fields.items():
+        model, is_list = _model_in(field.annotation)
+        default = (
+            _MISSING if field.is_required() else field.get_default(call_default_factory=True)
+        )
+        fields.append(
+            (field.alias or name, name, _fields(model) if model else None, is_list, default)
+        )
+
+    return tuple(fields)
+
+
+def _project(fields: tuple, obj: Any) -> dict[str, Any]:
+    # Словари (строки из Core запросов, json_agg) и ORM объекты
+    get = (
+        obj.get if isinstance(obj, dict) else lambda name, default: getattr(obj, name, default)
+    )
+    result = {}
+    for key, name, nested, is_list, default in fields:
+        if (value := get(name, default)) is _MISSING:
+            raise ValueError(
+                f"{type(obj).__name__} has no field {name!r} of the response schema"
+            )
+        if nested is not None and value is not None:
+            value = (
+                [_project(nested, item) for item in value]
+                if is_list
+                else _project(nested, value)
+            )
+        result[key] = value
+
+    return result
+
+
+def serializer_for(schema: type[BaseModel]) -> Callable[[Any], bytes]:
+    """
+    JSON serializer of `schema` fields of an ORM object or a dict, without validation
+    """
+    fields = _fields(schema)
+    return lambda obj: orjson.dumps(_project(fields, obj))
+
+
+def json_bytes(schema: type[BaseModel], obj: Any) -> bytes:
+    """
+    JSON body of `obj` by `schema`: trusted serializer, or pydantic validation
+    with trusted output off (for handlers which need the bytes, e.g. for ETag)
+    """
+    if settings.trusted_output:
+        return serializer_for(schema)(obj)
+
+    return schema.model_validate(obj, from_attributes=True).model_dump_json().encode()
+
+
+def trusted_json_response(
+    schema: type[BaseModel],
+    obj: Any,
+    status_code: int = status.HTTP_200_OK,
+) -> Response | Any:
+    """
+    Response with `obj` (our own DB data) serialized by `schema` fields, skipping
+    validation against response_model. With trusted output off `obj` is returned as is.
+    """
+    if not settings.trusted_output:
+        return obj
+
+    return Response(
+        content=serializer_for(schema)(obj),
+        status_code=status_code,
+        media_type="application/json",
+    )
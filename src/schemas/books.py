@@ -1,7 +1,24 @@
+from typing import Any
+
 from pydantic import BaseModel, Field, field_validator
 from pydantic_core import PydanticCustomError
 
-__all__ = ["IncomingBook", "ReturnedAllBooks", "ReturnedBook"]
+__all__ = [
+    "IncomingBook",
+    "IncomingBookForSeller",
+    "ReturnedAllBooks",
+    "ReturnedBook",
+    "ReturnedBulkBooks",
+    "BulkBookError",
+    "ReturnedBooksImport",
+]
+
+
+# Проверка года издания, общая для всех входящих книг
+def _validate_year(val: int) -> int:
+    if val < 1900:
+        raise PydanticCustomError("Validation error", "Year is wrong!")
+    return val
 
 
 # Базовый класс "Книги", содержащий поля, которые есть во всех классах-наследниках.
@@ -14,6 +31,9 @@ class BaseBook(BaseModel):
 
 # Класс для валидации входящих данных. Не содержит id так как его присваивает БД.
 class IncomingBook(BaseBook):
+    # Длины совпадают с колонками таблицы, иначе ошибку вернет уже БД
+    title: str = Field(max_length=50)
+    author: str = Field(max_length=100)
     year: int = 2024  # Пример присваивания дефолтного значения
     count_pages: int = Field(
         alias="pages",
@@ -23,9 +43,20 @@ class IncomingBook(BaseBook):
     @field_validator("year")  # Валидатор, проверяет что дата не слишком древняя
     @staticmethod
     def validate_year(val: int):
-        if val < 1900:
-            raise PydanticCustomError("Validation error", "Year is wrong!")
-        return val
+        return _validate_year(val)
+
+
+# Класс для валидации книги авторизованного продавца. seller_id берется из токена.
+class IncomingBookForSeller(BaseModel):
+    title: str = Field(max_length=50)
+    author: str = Field(max_length=100)
+    year: int = 2024
+    count_pages: int = 300
+
+    @field_validator("year")
+    @staticmethod
+    def validate_year(val: int):
+        return _validate_year(val)
 
 
 # Класс, валидирующий исходящие данные. Он уже содержит id
@@ -45,3 +76,34 @@ class ReturnedBookForSeller(BaseModel):
 # Класс для возврата массива объектов "Книга"
 class ReturnedAllBooks(BaseModel):
     books: list[ReturnedBook]
+    next_cursor: int | None = None  # передается в параметр after для следующей страницы
+
+
+# Ошибка одного элемента при массовом создании книг
+class BulkBookError(BaseModel):
+    index: int  # Позиция книги во входящем списке
+    detail: list[dict[str, Any]]  # Ошибки в формате pydantic: loc, msg, type
+
+
+# Класс для ответа на массовое создание книг: созданные книги и ошибки по остальным
+class ReturnedBulkBooks(BaseModel):
+    books: list[ReturnedBook]
+    errors: list[BulkBookError]
+
+
+# Ошибка одной строки CSV при импорте книг
+class BooksImportError(BaseModel):
+    line: int  # Номер строки в файле
+    detail: list[dict[str, Any]]
+
+
+# Класс для отчета об импорте книг из CSV
+class ReturnedBooksImport(BaseModel):
+    rows_total: int
+    rows_imported: int
+    rows_rejected: int
+    errors: list[BooksImportError]  # Только первые import_max_reported_errors ошибок
+    elapsed_seconds: float
+    rows_per_second: float  # Загруженных строк в секунду
+    # Наибольший рост RSS воркера за время импорта (замер после каждой пачки)
+    peak_memory_bytes: int | None
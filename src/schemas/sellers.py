@@ -68,6 +68,7 @@ class ReturnedAllSellers(BaseModel):
     """
 
     sellers: list[ReturnedSeller]
+    next_cursor: int | None = None  # id for `after` param to get the next page
 
 
 class ReturnedSellerFull(ReturnedSeller):
@@ -80,6 +80,7 @@ class ReturnedAllSellersJWT(BaseModel):
     """
 
     sellers: list[ReturnedSellerJWT]
+    next_cursor: int | None = None  # id for `after` param to get the next page
 
 
 class ReturnedSellerJWTFull(ReturnedSellerJWT):
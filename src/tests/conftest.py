@@ -4,12 +4,20 @@
 """
 
 import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
 
 import httpx
 import pytest
 import pytest_asyncio
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
+try:
+    import lupa
+except ImportError:  # без Lua скрипты EVAL не выполняются, тесты с ними пропускаются
+    lupa = None
+
 from src.configurations.settings import settings
 from src.models import books  # noqa
 from src.models.base import BaseModel
@@ -65,18 +73,214 @@ def override_get_async_session(db_session):
     return _override_get_async_session
 
 
+# Коллбэк для переопределения фабрики сессий (ручки со стримингом).
+# Отдает ту же тестовую сессию и не закрывает ее.
+@pytest.fixture(scope="function")
+def override_get_async_session_maker(db_session):
+    @asynccontextmanager
+    async def _test_session_scope():
+        yield db_session
+
+    def _override_get_async_session_maker():
+        return _test_session_scope
+
+    return _override_get_async_session_maker
+
+
+# Запись SQL запросов к тестовой базе: with record_statements() as statements: ...
+@pytest.fixture(scope="function")
+def record_statements(db_session):
+    engine = db_session.bind.sync_engine
+
+    @contextmanager
+    def _record_statements():
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+    return _record_statements
+
+
 # Мы не можем создать 2 приложения (app) - это приведет к ошибкам.
 # Поэтому, на время запуска тестов мы подменяем там зависимость с сессией
 @pytest.fixture(scope="function")
-def test_app(override_get_async_session):
-    from src.configurations.database import get_async_session
+def test_app(override_get_async_session, override_get_async_session_maker):
+    from src.configurations.database import (
+        get_async_read_session,
+        get_async_read_session_maker,
+        get_async_session,
+        get_async_session_maker,
+    )
     from src.main import app
 
     app.dependency_overrides[get_async_session] = override_get_async_session
+    app.dependency_overrides[get_async_read_session] = override_get_async_session
+    app.dependency_overrides[get_async_session_maker] = override_get_async_session_maker
+    app.dependency_overrides[get_async_read_session_maker] = override_get_async_session_maker
 
     return app
 
 
+# Кеш ответов живет в памяти процесса - очищаем его, чтобы тесты не видели ответы друг друга
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def clear_response_cache():
+    from src.configurations.cache import response_cache
+
+    await response_cache.clear()
+    yield
+
+
+# Корзины лимитов входа тоже в памяти процесса - у каждого теста полные корзины
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def clear_rate_limits():
+    from src.configurations.rate_limit import rate_limit_store
+
+    await rate_limit_store.clear()
+    yield
+
+
+class RespReplyError(Exception):
+    """
+    Error reply of the fake Redis server
+    """
+
+
+# Сервер с протоколом Redis в памяти теста (для общего кеша и лимитов)
+class FakeRedisServer:
+    """
+    In-memory server speaking Redis protocol (only commands used by the cache and rate limits)
+    """
+
+    def __init__(self) -> None:
+        self.data: dict[bytes, tuple[bytes, float | None]] = {}
+        self.commands: list[bytes] = []
+        self.server: asyncio.Server | None = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self._execute(args[0].upper(), args[1:]))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def _get(self, key: bytes) -> bytes | None:
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    @classmethod
+    def _reply(cls, value) -> bytes:
+        # Ответ в протоколе Redis (RESP)
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, RespReplyError):
+            return b"-%b\r\n" % str(value).encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(map(cls._reply, value))
+        if value == b"OK":
+            return b"+OK\r\n"
+        return b"$%d\r\n%b\r\n" % (len(value), value)
+
+    def _execute(self, command: bytes, args: list[bytes]) -> bytes:
+        self.commands.append(command)
+        try:
+            return self._reply(self._call(command, args))
+        except RespReplyError as e:
+            return self._reply(e)
+
+    def _call(self, command: bytes, args: list[bytes]):
+        if command == b"GET":
+            return self._get(args[0])
+        if command == b"MGET":
+            return [self._get(key) for key in args]
+        if command == b"SET":
+            key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+            if b"NX" in options and self._get(key) is not None:
+                return None
+            expires_at = None
+            if b"PX" in options:
+                expires_at = time.monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+            self.data[key] = (value, expires_at)
+            return b"OK"
+        if command == b"INCR":
+            value = int(self._get(args[0]) or 0) + 1
+            self.data[args[0]] = (str(value).encode(), None)
+            return value
+        if command == b"DEL":
+            return sum(self.data.pop(key, None) is not None for key in args)
+        if command == b"TIME":
+            seconds, microseconds = divmod(time.time_ns() // 1000, 1_000_000)
+            return [str(seconds).encode(), str(microseconds).encode()]
+        if command == b"EVAL":
+            return self._eval(args[0], args[2 : 2 + int(args[1])], args[2 + int(args[1]) :])
+        raise RespReplyError("ERR unknown command")
+
+    def _eval(self, script: bytes, keys: list[bytes], argv: list[bytes]):
+        # Скрипт выполняет настоящий Lua (lupa), redis.call - команды этого же сервера
+        if lupa is None:
+            raise RespReplyError("ERR Lua is not available (pip install lupa)")
+
+        lua = lupa.LuaRuntime(encoding=None)
+
+        def to_lua(value):
+            # Как в Redis: nil - false, массив - таблица, статус - таблица {ok = ...}
+            if value is None:
+                return False
+            if isinstance(value, list):
+                return lua.table_from([to_lua(item) for item in value])
+            if value == b"OK":
+                return lua.table_from({b"ok": value})
+            return value
+
+        def call(command, *args):
+            args = [arg if isinstance(arg, bytes) else b"%d" % arg for arg in args]
+            self.commands.append(command.upper())
+            return to_lua(self._call(command.upper(), args))
+
+        lua.globals().redis = lua.table_from({b"call": call})
+        lua.globals().KEYS = lua.table_from(keys)
+        lua.globals().ARGV = lua.table_from(argv)
+        try:
+            result = lua.execute(script)
+        except lupa.LuaError as e:
+            raise RespReplyError(f"ERR Error running script: {e}")
+
+        # Число Lua в ответе Redis - целое
+        return int(result) if isinstance(result, (int, float)) else result
+
+
+@pytest_asyncio.fixture(scope="function")
+async def fake_redis():
+    server = FakeRedisServer()
+    port = await server.start()
+    yield server, f"redis://127.0.0.1:{port}/0"
+    await server.stop()
+
+
 # создаем асинхронного клиента для ручек
 @pytest_asyncio.fixture(scope="function")
 async def async_client(test_app):
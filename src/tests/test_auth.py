@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+
+import bcrypt
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from fastapi import status
+
+from src.configurations.auth import utils as auth_utils
+from src.configurations.auth.keys import Keyring
+from src.configurations.auth.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def test_decode_jwt_cached_verifies_token_once(monkeypatch):
+    """
+    Signature of the same token is checked once, expired tokens are not cached
+    """
+    decoded = []
+    decode_jwt = auth_utils.decode_jwt
+
+    def counting_decode_jwt(token, *args, **kwargs):
+        decoded.append(token)
+        return decode_jwt(token, *args, **kwargs)
+
+    monkeypatch.setattr(auth_utils, "decode_jwt", counting_decode_jwt)
+
+    token = auth_utils.encode_jwt({"seller_id": 1, "nonce": time.time()})
+    for _ in range(3):
+        payload = auth_utils.decode_jwt_cached(token)
+        assert payload["seller_id"] == 1
+        payload["seller_id"] = 2  # изменения копии не попадают в кеш
+
+    assert decoded == [token]
+
+    # Токен, срок которого почти истек, кешируется не дольше exp
+    token = auth_utils.encode_jwt({"seller_id": 1, "exp": int(time.time()) + 1})
+    auth_utils.decode_jwt_cached(token)
+    time.sleep(1.1)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        auth_utils.decode_jwt_cached(token)
+
+
+def _write_key_pair(directory, private_key):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "private.pem").write_bytes(
+        private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    (directory / "public.pem").write_bytes(
+        private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+    )
+
+
+@pytest.mark.parametrize(
+    "private_key, algorithm",
+    [
+        (ec.generate_private_key(ec.SECP256R1()), "ES256"),
+        (ed25519.Ed25519PrivateKey.generate(), "EdDSA"),
+    ],
+)
+def test_keyring_rotation(tmp_path, monkeypatch, private_key, algorithm):
+    """
+    Keys are reloaded when files change, tokens signed with the previous key are still valid
+    """
+    certs = tmp_path / "certs"
+    _write_key_pair(certs, rsa.generate_private_key(public_exponent=65537, key_size=2048))
+
+    keyring = Keyring(
+        certs / "private.pem", certs / "public.pem", certs / "previous", reload_interval=0
+    )
+    monkeypatch.setattr(auth_utils, "keyring", keyring)
+
+    old_token = auth_utils.encode_jwt({"seller_id": 1})
+    old_kid = jwt.get_unverified_header(old_token)["kid"]
+    assert keyring.signing_key.algorithm == "RS256"
+
+    # Смена ключа без рестарта: старый публичный ключ - в previous, новая пара - на его место
+    (certs / "previous").mkdir()
+    (certs / "public.pem").rename(certs / "previous" / "old.pem")
+    _write_key_pair(certs, private_key)
+
+    new_token = auth_utils.encode_jwt({"seller_id": 2})
+    header = jwt.get_unverified_header(new_token)
+    assert header["alg"] == algorithm
+    assert header["kid"] != old_kid
+
+    assert auth_utils.decode_jwt(old_token)["seller_id"] == 1
+    assert auth_utils.decode_jwt(new_token)["seller_id"] == 2
+    assert [key["kid"] for key in keyring.jwks()["keys"]] == [header["kid"], old_kid]
+
+    # Старый ключ удален - его токены больше не принимаются
+    (certs / "previous" / "old.pem").unlink()
+    with pytest.raises(jwt.InvalidTokenError):
+        auth_utils.decode_jwt(old_token)
+
+
+@pytest.mark.asyncio
+async def test_jwks_and_invalid_token(async_client):
+    """
+    JWKS has the current key, token signed with an unknown key is rejected with 401
+    """
+    response = await async_client.get("/api/v1/jwt/.well-known/jwks.json")
+    assert response.status_code == status.HTTP_200_OK
+    [key] = response.json()["keys"]
+    assert key["kid"] == auth_utils.keyring.signing_key.kid
+    assert key["alg"] == "RS256"
+    assert key["use"] == "sig"
+
+    token = jwt.encode(
+        {"seller_id": 1},
+        ed25519.Ed25519PrivateKey.generate(),
+        algorithm="EdDSA",
+        headers={"kid": "unknown"},
+    )
+    response = await async_client.get(
+        "/api/v1/jwt/sellers/me/info", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_keeps_event_loop_free():
+    """
+    bcrypt runs in the pool: the event loop keeps working, excess operations get rejected
+    """
+    hasher = PasswordHasher(workers=1, queue_size=1, rounds=10)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    ticker_task = asyncio.create_task(ticker())
+    try:
+        hashed = await hasher.hash("password")
+    finally:
+        ticker_task.cancel()
+
+    assert ticks > 1  # пока считался хеш, event loop обслуживал другую задачу
+    assert hashed.startswith(b"$2b$10$")
+    assert await hasher.verify("password", hashed)
+    assert not await hasher.verify("wrong", hashed)
+
+    # Один поток занят, одно место в очереди занято - третья операция отклоняется
+    release = threading.Event()
+    running = [asyncio.ensure_future(hasher._run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(PasswordHasherBusy):
+        await hasher.verify("password", hashed)
+
+    release.set()
+    await asyncio.gather(*running)
+    assert hasher.stats()["pending"] == 0
+    assert hasher.stats()["rejected"] == 1
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_signup_returns_503_when_hasher_is_busy(async_client, monkeypatch):
+    hasher = PasswordHasher(workers=1, queue_size=0, rounds=4)
+    monkeypatch.setattr(auth_utils, "password_hasher", hasher)
+
+    release = threading.Event()
+    running = asyncio.ensure_future(hasher._run(release.wait))
+    try:
+        response = await async_client.post(
+            "/api/v1/jwt/signup",
+            data={"email": "busy@example.com", "password": "password"},
+        )
+    finally:
+        release.set()
+        await running
+        hasher.shutdown()
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_hash_password_uses_configured_rounds(monkeypatch):
+    monkeypatch.setattr(auth_utils.password_hasher, "rounds", 5)
+    hashed = auth_utils.hash_password("password")
+
+    assert hashed.startswith(b"$2b$05$")
+    assert bcrypt.checkpw(b"password", hashed)
@@ -0,0 +1,201 @@
+import asyncio
+
+import pytest
+
+from src.configurations import cache_backends
+from src.configurations.cache import ResponseCache
+from src.configurations.cache_backends import MemoryCacheBackend, RedisCacheBackend, TTLCache
+from src.configurations.single_flight import SingleFlight
+from src.models import books, books_jwt, sellers
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expired(monkeypatch):
+    """
+    Cache keeps at most max_entries (least recently used are evicted), entries expire after ttl
+    """
+    now = [100.0]
+    monkeypatch.setattr(cache_backends.time, "monotonic", lambda: now[0])
+
+    storage = TTLCache(max_entries=2, ttl=10)
+    storage.set("a", 1)
+    storage.set("b", 2)
+    assert storage.get("a") == 1  # "a" прочитан последним, вытеснится "b"
+    storage.set("c", 3)
+
+    assert storage.get("b") is None
+    assert storage.get("a") == 1
+    assert storage.get("c") == 3
+
+    now[0] += 10
+    assert storage.get("a") is None
+
+    assert storage.stats() == {
+        "entries": 1,
+        "max_entries": 2,
+        "ttl_seconds": 10,
+        "hits": 3,
+        "misses": 2,
+        "evictions": 1,
+        "expirations": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_response_cache_invalidate_by_table():
+    """
+    Invalidation of a table drops all its cached responses and does not touch other tables
+    """
+    response_cache = ResponseCache(MemoryCacheBackend(max_entries=10, ttl=10), ttl=10)
+    loads = []
+
+    async def load(value):
+        loads.append(value)
+        return value
+
+    assert await response_cache.get_or_load(books.Book, ("id", 1), lambda: load(b"1")) == b"1"
+    assert await response_cache.get_or_load(books.Book, ("id", 1), lambda: load(b"2")) == b"1"
+    assert (
+        await response_cache.get_or_load(sellers.Seller, ("id", 1), lambda: load(b"3")) == b"3"
+    )
+
+    await response_cache.invalidate(books.Book)
+
+    assert await response_cache.get_or_load(books.Book, ("id", 1), lambda: load(b"4")) == b"4"
+    assert (
+        await response_cache.get_or_load(sellers.Seller, ("id", 1), lambda: load(b"5")) == b"3"
+    )
+    # Ненайденное не кешируется
+    assert await response_cache.get_or_load(books.Book, ("id", 2), lambda: load(None)) is None
+    assert await response_cache.get_or_load(books.Book, ("id", 2), lambda: load(None)) is None
+
+    assert loads == [b"1", b"3", b"4", None, None]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    """
+    Concurrent requests of the same missing entry make one load, the others get its result
+    """
+    response_cache = ResponseCache(MemoryCacheBackend(max_entries=10, ttl=10), ttl=10)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.05)
+        return b"books"
+
+    results = await asyncio.gather(
+        *[response_cache.get_or_load(books.Book, ("list", 100, None), load) for _ in range(10)]
+    )
+
+    assert results == [b"books"] * 10
+    assert len(loads) == 1
+    assert response_cache.stats()["single_flight"] == {
+        "in_flight": 0,
+        "leaders": 1,
+        "deduplicated": 9,
+    }
+
+    # После записи в таблицу новый запрос не присоединяется к загрузке, начатой до нее
+    slow = asyncio.create_task(response_cache.get_or_load(books.Book, ("id", 1), load))
+    await asyncio.sleep(0)
+    await response_cache.invalidate(books.Book)
+    await asyncio.gather(slow, response_cache.get_or_load(books.Book, ("id", 1), load))
+    assert len(loads) == 3
+
+
+@pytest.mark.asyncio
+async def test_single_flight_errors_and_cancelled_leader():
+    """
+    Error of the load is shared, if the leader is cancelled the waiting caller loads itself
+    """
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("db is down")
+
+    results = await asyncio.gather(
+        single_flight.do("key", fail), single_flight.do("key", fail), return_exceptions=True
+    )
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return 1
+
+    leader = asyncio.create_task(single_flight.do("key", load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(single_flight.do("key", load))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == 1
+    assert leader.cancelled()
+    assert single_flight.stats() == {"in_flight": 0, "leaders": 3, "deduplicated": 1}
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_shared_between_processes(fake_redis):
+    """
+    Caches of two processes on one Redis server: entry stored by one is read by another,
+    invalidation in one of them drops the entry for both
+    """
+    server, url = fake_redis
+    caches = [
+        ResponseCache(RedisCacheBackend(url, "test", pool_size=2, timeout=1), ttl=10)
+        for _ in range(2)
+    ]
+
+    async def load(value):
+        return value
+
+    try:
+        assert await caches[0].get_or_load(books.Book, ("id", 1), lambda: load(b"1")) == b"1"
+        assert await caches[1].get_or_load(books.Book, ("id", 1), lambda: load(b"2")) == b"1"
+        # Пространства имен моделей не пересекаются
+        assert (
+            await caches[1].get_or_load(books_jwt.BookJWT, ("id", 1), lambda: load(b"3"))
+            == b"3"
+        )
+
+        await caches[1].invalidate(books.Book)
+
+        assert await caches[0].get_or_load(books.Book, ("id", 1), lambda: load(b"4")) == b"4"
+        assert (
+            await caches[0].get_or_load(books_jwt.BookJWT, ("id", 1), lambda: load(b"5"))
+            == b"3"
+        )
+        assert server.commands.count(b"INCR") == 1
+
+        # Версия таблицы общая для всех процессов
+        versions = [await response_cache.version(books.Book) for response_cache in caches]
+        assert versions[0] == versions[1]
+
+        # После очистки сервера все старые ответы недостижимы
+        await caches[0].clear()
+        assert await caches[1].get_or_load(books.Book, ("id", 1), lambda: load(b"6")) == b"6"
+    finally:
+        for response_cache in caches:
+            await response_cache.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_unavailable(fake_redis):
+    """
+    Without Redis responses are loaded from DB and errors are counted
+    """
+    server, url = fake_redis
+    await server.stop()
+
+    response_cache = ResponseCache(
+        RedisCacheBackend(url, "test", pool_size=2, timeout=1), ttl=10
+    )
+
+    async def load(value):
+        return value
+
+    assert await response_cache.get_or_load(books.Book, ("id", 1), lambda: load(b"1")) == b"1"
+    await response_cache.invalidate(books.Book)
+
+    assert response_cache.stats()["errors"] == 2
@@ -0,0 +1,160 @@
+import asyncio
+import gzip
+import zlib
+
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+from src.middlewares import compression
+from src.middlewares.compression import CompressionMiddleware, choose_encoding
+
+BIG = {"books": [{"id": book_id, "title": "Clean Code"} for book_id in range(1000)]}
+
+
+def _create_app() -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+
+    @app.get("/small")
+    async def small():
+        return {"access_token": "token", "token_type": "Bearer"}
+
+    @app.get("/big")
+    async def big():
+        return ORJSONResponse(BIG, headers={"ETag": '"tag"'})
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for book in BIG["books"]:
+                yield orjson.dumps(book) + b"\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware)
+    return app
+
+
+@pytest.fixture
+def client():
+    return httpx.AsyncClient(app=_create_app(), base_url="http://test")
+
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    monkeypatch.setattr(compression, "zstandard", None)
+
+    assert choose_encoding(None) is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip, deflate, br, zstd") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("*") == "gzip"
+
+
+@pytest.mark.asyncio
+async def test_compress_only_big_responses(client, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    monkeypatch.setattr(compression, "zstandard", None)
+
+    async with client:
+        response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.json()["token_type"] == "Bearer"
+
+        response = await client.get("/big", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+        response = await client.get("/big", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "accept-encoding"
+        assert response.headers["etag"] == 'W/"tag"'
+        assert int(response.headers["content-length"]) < len(orjson.dumps(BIG)) / 5
+        assert response.json() == BIG
+
+
+@pytest.mark.asyncio
+async def test_compress_big_body_in_thread(client, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    monkeypatch.setattr(compression, "zstandard", None)
+    monkeypatch.setattr(compression.settings, "compression_thread_size", 10_000)
+
+    offloaded = []
+    to_thread = compression.asyncio.to_thread
+
+    async def counting_to_thread(func, *args):
+        offloaded.append(len(args[0]))
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(compression.asyncio, "to_thread", counting_to_thread)
+
+    async with client:
+        response = await client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+    assert offloaded == [len(orjson.dumps(BIG))]
+    assert response.json() == BIG
+
+
+@pytest.mark.asyncio
+async def test_compress_streaming_response(monkeypatch):
+    """
+    Every part of a streaming response is compressed and sent at once
+    """
+    monkeypatch.setattr(compression, "brotli", None)
+    monkeypatch.setattr(compression, "zstandard", None)
+
+    # Напрямую через ASGI: тестовый транспорт httpx собирает все тело целиком
+    messages = []
+
+    async def receive():
+        # Клиент не отключается: ждем, пока ответ не будет отправлен
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/stream",
+        "raw_path": b"/stream",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "server": ("test", 80),
+        "client": ("127.0.0.1", 1),
+    }
+    await _create_app()(scope, receive, send)
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    # Каждая часть разжимается сразу, не дожидаясь конца ответа
+    decompressor = zlib.decompressobj(31)
+    first = decompressor.decompress(messages[1]["body"])
+    assert first == orjson.dumps(BIG["books"][0]) + b"\n"
+
+    body = b"".join(message["body"] for message in messages[1:])
+    lines = gzip.decompress(body).splitlines()
+    assert [orjson.loads(line) for line in lines] == BIG["books"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding", ["br", "zstd"])
+async def test_optional_encodings(client, encoding):
+    module = pytest.importorskip({"br": "brotli", "zstd": "zstandard"}[encoding])
+    if encoding == "br":
+        decompress = module.decompress
+    else:
+        decompress = module.ZstdDecompressor().decompressobj().decompress
+
+    # Тело читается как есть: httpx сам разжимает br
+    headers = {"Accept-Encoding": f"gzip;q=0.5, {encoding}"}
+    async with client, client.stream("GET", "/big", headers=headers) as response:
+        assert response.headers["content-encoding"] == encoding
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    assert orjson.loads(decompress(body)) == BIG
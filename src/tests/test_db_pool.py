@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from fastapi import status
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.configurations.pool import MeteredAsyncQueuePool, describe_pool
+from src.configurations.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_count_waiting_and_timeouts():
+    """
+    Pool stats show checked out connections, waiting requests and timeouts
+    """
+    engine = create_async_engine(
+        settings.database_test_url,
+        poolclass=MeteredAsyncQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.5,
+    )
+
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+            stats = describe_pool(engine.pool)
+            assert stats["pool_size"] == 1
+            assert stats["checked_out"] == 1
+            assert stats["idle"] == 0
+            assert stats["checkouts"] == 1
+
+            # Единственное соединение занято - второй запрос ждет и падает по таймауту
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+        stats = describe_pool(engine.pool)
+        assert stats["checked_out"] == 0
+        assert stats["idle"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["waiting"] == 0
+
+        # Второй запрос дождется соединения, как только первый его вернет
+        async def hold_connection():
+            async with engine.connect() as conn:
+                await asyncio.sleep(0.1)
+                await conn.execute(text("SELECT 1"))
+
+        await asyncio.gather(hold_connection(), hold_connection())
+
+        stats = describe_pool(engine.pool)
+        assert stats["checkouts"] == 3
+        assert stats["wait_seconds_max"] >= 0.05
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_internal_stats_require_token(async_client, monkeypatch):
+    """
+    Internal stats are hidden without a configured token and need it in X-Internal-Token
+    """
+    # Пул приложения в тестах не создается
+    monkeypatch.setattr(
+        "src.routers.v1.internal_routers.stats.get_pool_stats", lambda: {"primary": {}}
+    )
+    monkeypatch.setattr(settings, "internal_stats_token", None)
+    response = await async_client.get("/api/v1/internal/stats/db_pool")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    monkeypatch.setattr(settings, "internal_stats_token", "secret")
+    for headers in ({}, {"X-Internal-Token": "wrong"}):
+        response = await async_client.get("/api/v1/internal/stats/db_pool", headers=headers)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = await async_client.get(
+        "/api/v1/internal/stats/db_pool", headers={"X-Internal-Token": "secret"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"primary": {}}
+
+    response = await async_client.get("/openapi.json")
+    assert not any(path.startswith("/api/v1/internal") for path in response.json()["paths"])
@@ -0,0 +1,215 @@
+import itertools
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import Depends, FastAPI, Request
+from sqlalchemy import delete, exc, insert, select, text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.configurations import database
+from src.configurations.cache import response_cache
+from src.configurations.pool import MeteredAsyncQueuePool, describe_pool
+from src.configurations.settings import settings
+from src.middlewares import PrimaryPinMiddleware
+from src.models.sellers import Seller
+from src.routers.v1.utils.json_reads import cached_json_response, load_row_json
+
+
+def _request(cookies: str = "") -> Request:
+    return Request({"type": "http", "headers": [(b"cookie", cookies.encode())]})
+
+
+# Подменяем фабрики сессий приложения на фабрики для тестовой базы
+@pytest_asyncio.fixture(scope="function")
+async def test_engine(monkeypatch):
+    engine = create_async_engine(settings.database_test_url, poolclass=MeteredAsyncQueuePool)
+    monkeypatch.setattr(database, "__session_factory", async_sessionmaker(engine))
+    monkeypatch.setattr(
+        database,
+        "__read_session_factory",
+        async_sessionmaker(engine.execution_options(postgresql_readonly=True)),
+    )
+    monkeypatch.setattr(database, "__replica_session_factories", None)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_unused_sessions_do_not_touch_db(test_engine):
+    """
+    Session which runs no queries never checks out a connection
+    """
+    for dependency in (database.get_async_session, database.get_async_read_session):
+        session_gen = dependency(_request())
+        await anext(session_gen)
+        with pytest.raises(StopAsyncIteration):
+            await anext(session_gen)
+
+    assert describe_pool(test_engine.pool)["checkouts"] == 0
+
+
+@pytest.mark.asyncio
+async def test_read_session_is_read_only(test_engine):
+    """
+    Read session checks out connection on first query and rejects writes
+    """
+    session_gen = database.get_async_read_session(_request())
+    session = await anext(session_gen)
+
+    assert describe_pool(test_engine.pool)["checked_out"] == 0
+    await session.execute(select(Seller.id))
+    assert describe_pool(test_engine.pool)["checked_out"] == 1
+
+    with pytest.raises(exc.DBAPIError, match="read-only transaction"):
+        await session.execute(
+            insert(Seller).values(first_name="a", second_name="b", email="c", password="d")
+        )
+
+    with pytest.raises(StopAsyncIteration):
+        await anext(session_gen)
+    assert describe_pool(test_engine.pool)["checked_out"] == 0
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replicas_unless_pinned(test_engine, monkeypatch):
+    """
+    Reads are spread over replicas round-robin, pinned client reads from primary
+    """
+    used = []
+
+    def factory(name):
+        def _factory():
+            used.append(name)
+            return async_sessionmaker(test_engine)()
+
+        return _factory
+
+    monkeypatch.setattr(database, "__read_session_factory", factory("primary"))
+    monkeypatch.setattr(
+        database,
+        "__replica_session_factories",
+        itertools.cycle([factory("replica_1"), factory("replica_2")]),
+    )
+
+    pinned = f"{database.PRIMARY_PIN_COOKIE}={time.time() + 60}"
+    expired = f"{database.PRIMARY_PIN_COOKIE}={time.time() - 60}"
+    for cookies in ("", "", pinned, expired):
+        session_gen = database.get_async_read_session(_request(cookies))
+        await anext(session_gen)
+        await session_gen.aclose()
+
+    assert used == ["replica_1", "replica_2", "primary", "replica_1"]
+
+    # Фабрика для стриминга (выгрузка) выбирает сессию так же
+    used.clear()
+    for cookies in ("", pinned):
+        async with database.get_async_read_session_maker(_request(cookies))():
+            pass
+
+    assert used == ["replica_2", "primary"]
+
+
+@pytest.mark.asyncio
+async def test_write_pins_client_to_primary(test_engine):
+    """
+    After commit of a write the client gets primary pin cookie, selects do not pin it
+    """
+    app = FastAPI()
+    app.add_middleware(PrimaryPinMiddleware)
+
+    @app.get("/read")
+    async def read(session=Depends(database.get_async_session)):
+        return {}
+
+    @app.get("/select")
+    async def select_only(session=Depends(database.get_async_session)):
+        # Транзакция открыта и закрывается commit, но ничего не записано
+        await session.execute(select(Seller.id))
+        return {}
+
+    @app.post("/write")
+    async def write(session=Depends(database.get_async_session)):
+        await session.execute(update(Seller).where(Seller.id == -1).values(first_name="a"))
+        return {}
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for path in ("/read", "/select"):
+            response = await client.get(path)
+            assert database.PRIMARY_PIN_COOKIE not in response.cookies
+
+        response = await client.post("/write")
+        pinned_until = float(response.cookies[database.PRIMARY_PIN_COOKIE])
+        assert pinned_until > time.time()
+
+
+# Реплика с лагом: копия таблицы продавцов в отдельной схеме, без последней записи
+@pytest_asyncio.fixture(scope="function")
+async def stale_replica(test_engine):
+    seller = {"id": 1000, "second_name": "Iden", "email": "martin@iden.com", "password": "1"}
+    async with test_engine.begin() as conn:
+        await conn.execute(text("CREATE SCHEMA stale_replica"))
+        await conn.execute(
+            text("CREATE TABLE stale_replica.sellers_table (LIKE public.sellers_table)")
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO stale_replica.sellers_table (id, first_name, second_name, email, "
+                "password) VALUES (:id, 'Old', :second_name, :email, :password)"
+            ),
+            seller,
+        )
+        # id задан явно, чтобы не сдвинуть последовательность id для других тестов
+        await conn.execute(insert(Seller).values(first_name="New", **seller))
+
+    replica_engine = create_async_engine(
+        settings.database_test_url,
+        connect_args={"server_settings": {"search_path": "stale_replica"}},
+    )
+    yield database.replica_session_factory(replica_engine, test_engine)
+
+    await replica_engine.dispose()
+    async with test_engine.begin() as conn:
+        await conn.execute(text("DROP SCHEMA stale_replica CASCADE"))
+        await conn.execute(delete(Seller).where(Seller.id == 1000))
+
+
+@pytest.mark.asyncio
+async def test_cache_is_filled_from_primary(stale_replica, monkeypatch):
+    """
+    Lagging replica serves uncached reads, responses for the cache are read from primary,
+    pinned client bypasses the cache
+    """
+    monkeypatch.setattr(
+        database, "__replica_session_factories", itertools.cycle([stale_replica])
+    )
+
+    app = FastAPI()
+
+    @app.get("/sellers/{seller_id}")
+    async def get_seller(
+        seller_id: int, request: Request, session=Depends(database.get_async_read_session)
+    ):
+        return await cached_json_response(
+            request,
+            Seller,
+            ("id", seller_id),
+            lambda: load_row_json(session, [Seller.id, Seller.first_name], seller_id),
+        )
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        monkeypatch.setattr(response_cache, "enabled", False)
+        response = await client.get("/sellers/1000")
+        assert response.json() == {"id": 1000, "first_name": "Old"}
+
+        monkeypatch.setattr(response_cache, "enabled", True)
+        for _ in range(2):
+            response = await client.get("/sellers/1000")
+            assert response.json() == {"id": 1000, "first_name": "New"}
+
+        hits = response_cache.hits
+        pinned = f"{database.PRIMARY_PIN_COOKIE}={time.time() + 60}"
+        response = await client.get("/sellers/1000", headers={"cookie": pinned})
+        assert response.json() == {"id": 1000, "first_name": "New"}
+        assert response_cache.hits == hits
@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+
+from src.models import books, books_jwt, sellers_jwt
+
+
+async def _explain(db_session, query) -> str:
+    compiled = query.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    res = await db_session.execute(text(f"EXPLAIN {compiled}"))
+    return "\n".join(res.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes(db_session):
+    """
+    Books of seller and seller by email are searched by index, not by sequential scan
+    """
+    # На пустых тестовых таблицах планировщику дешевле seq scan,
+    # поэтому запрещаем его и проверяем, что индекс вообще может быть использован.
+    await db_session.execute(text("SET LOCAL enable_seqscan = off"))
+
+    plan = await _explain(db_session, select(books.Book).where(books.Book.seller_id == 1))
+    assert "ix_books_table_seller_id" in plan
+
+    plan = await _explain(
+        db_session, select(books_jwt.BookJWT).where(books_jwt.BookJWT.seller_id == 1)
+    )
+    assert "ix_books_jwt_table_seller_id" in plan
+
+    plan = await _explain(
+        db_session,
+        select(sellers_jwt.SellerJWT).where(sellers_jwt.SellerJWT.email == "a@b.com"),
+    )
+    assert "ix_sellers_jwt_table_email" in plan
@@ -34,6 +34,36 @@ async def test_signup_seller_jwt(db_session, async_client):
     }
 
 
+@pytest.mark.asyncio
+async def test_signup_seller_jwt_email_race(db_session, async_client, test_app, monkeypatch):
+    """
+    Email taken after the registration check is rejected by the unique index with 401
+    """
+    from src.routers.v1.jwt_routers.utils.utils_jwt import validate_registration_user
+    from src.schemas import SignInSellerJWT
+
+    await db_session.execute(delete(sellers_jwt.SellerJWT))
+    db_session.add(
+        sellers_jwt.SellerJWT(
+            id=1000,
+            email="martiniden@gmail.com",
+            password=b"",
+            first_name="Martin",
+            second_name="Iden",
+        )
+    )
+    await db_session.flush()
+
+    # Проверка занятости email уже пройдена - как будто второй запрос успел раньше
+    seller = SignInSellerJWT(email="martiniden@gmail.com", password="test00")
+    monkeypatch.setitem(
+        test_app.dependency_overrides, validate_registration_user, lambda: seller
+    )
+
+    response = await async_client.post("/api/v1/jwt/signup")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
 @pytest.mark.asyncio
 async def test_login_seller_jwt(db_session, async_client):
     """
@@ -121,6 +151,23 @@ async def test_update_seller_jwt(db_session, async_client):
         "email": "martinidenza@gmail.com",
     }
 
+    # Email другого продавца занят (уникальный индекс) - 409, а не 500
+    other_seller = sellers_jwt.SellerJWT(
+        email="other@gmail.com",
+        password=auth_utils.hash_password(test_password),
+        first_name="Other",
+        second_name="Seller",
+    )
+    db_session.add(other_seller)
+    await db_session.flush()
+
+    response = await async_client.put(
+        "/api/v1/jwt/sellers/me/info/update",
+        data={"email": "other@gmail.com"},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+
 
 @pytest.mark.asyncio
 async def test_get_seller_jwt_list(db_session, async_client):
@@ -165,7 +212,8 @@ async def test_get_seller_jwt_list(db_session, async_client):
                 "second_name": seller_2.second_name,
                 "email": seller_2.email,
             },
-        ]
+        ],
+        "next_cursor": None,
     }
 
 
@@ -218,6 +266,53 @@ async def test_add_book_seller_jwt(db_session, async_client):
     }
 
 
+@pytest.mark.asyncio
+async def test_add_books_bulk_seller_jwt(db_session, async_client):
+    """
+    add list of books to seller, invalid ones are reported by index
+    """
+    await db_session.execute(delete(sellers_jwt.SellerJWT))
+
+    seller = sellers_jwt.SellerJWT(
+        email="martiniden@gmail.com",
+        password=auth_utils.hash_password("test"),
+        first_name="Martin",
+        second_name="Iden",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    token = auth_utils.encode_jwt(payload={"email": seller.email, "seller_id": seller.id})
+
+    data = [
+        {"title": "Wrong Code", "author": "Robert Martin", "count_pages": 104, "year": 2007},
+        {"title": "Clean Code" * 10, "author": "Robert Martin"},
+        {"title": "Clean Code", "author": "Robert Martin", "count_pages": 2**40},
+    ]
+    headers = {"Authorization": "Bearer " + token}
+    response = await async_client.post(
+        "/api/v1/jwt/sellers/me/books/add_bulk",
+        json=data,
+        headers=headers,
+    )
+    result_data = response.json()
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert result_data["books"] == [
+        {
+            "id": result_data["books"][0]["id"],
+            "seller_id": seller.id,
+            "title": "Wrong Code",
+            "author": "Robert Martin",
+            "year": 2007,
+            "count_pages": 104,
+        },
+    ]
+    assert [error["index"] for error in result_data["errors"]] == [1, 2]
+    assert result_data["errors"][0]["detail"][0]["loc"] == ["title"]
+    assert result_data["errors"][1]["detail"][0]["type"] == "db_error"
+
+
 @pytest.mark.asyncio
 async def test_get_book_by_id_seller_jwt(db_session, async_client):
     """
@@ -328,9 +423,29 @@ async def test_get_books_list_seller_jwt(db_session, async_client):
                 "id": book_2.id,
                 "count_pages": book_2.count_pages,
             },
-        ]
+        ],
+        "next_cursor": None,
     }
 
+    response = await async_client.get(
+        "/api/v1/jwt/books/list",
+        params={"limit": 1},
+    )
+    result_data = response.json()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [book["id"] for book in result_data["books"]] == [book_1.id]
+    assert result_data["next_cursor"] == book_1.id
+
+    response = await async_client.get(
+        "/api/v1/jwt/books/list",
+        params={"limit": 1, "after": result_data["next_cursor"]},
+    )
+    result_data = response.json()
+
+    assert [book["id"] for book in result_data["books"]] == [book_2.id]
+    assert result_data["next_cursor"] is None
+
 
 @pytest.mark.asyncio
 async def test_get_seller_jwt_info(db_session, async_client):
@@ -405,6 +520,23 @@ async def test_get_seller_jwt_info(db_session, async_client):
             },
         ],
     }
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    # С тем же ETag - 304 без тела; после изменения книг ETag другой
+    etag = response.headers["etag"]
+    response = await async_client.get(
+        "/api/v1/jwt/sellers/me/info", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    book_2.title = "Clean Code 2"
+    await db_session.flush()
+    response = await async_client.get(
+        "/api/v1/jwt/sellers/me/info", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
 
 
 @pytest.mark.asyncio
@@ -600,3 +732,275 @@ async def test_delete_seller_jwt(db_session, async_client):
     all_books = await db_session.execute(select(books_jwt.BookJWT))
     res = all_books.scalars().all()
     assert len(res) == 2
+
+
+# Тест пересчета хеша пароля с другим cost при входе
+@pytest.mark.asyncio
+async def test_login_rehashes_password_with_configured_cost(
+    db_session, async_client, monkeypatch
+):
+    """
+    Login with a password hashed with an old cost saves a hash with the configured cost
+    """
+    await db_session.execute(delete(sellers_jwt.SellerJWT))
+
+    monkeypatch.setattr(auth_utils.password_hasher, "rounds", 4)
+    seller = sellers_jwt.SellerJWT(
+        email="martiniden@gmail.com",
+        password=auth_utils.hash_password("test"),
+        first_name="Martin",
+        second_name="Iden",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    # Тестовая сессия общая для теста и откатывается в конце, ее не коммитим
+    monkeypatch.setattr(db_session, "commit", db_session.flush)
+    monkeypatch.setattr(auth_utils.password_hasher, "rounds", 5)
+    data = {"email": seller.email, "password": "test"}
+    response = await async_client.post("/api/v1/jwt/login", data=data)
+    assert response.status_code == status.HTTP_200_OK
+
+    # Хеш пересчитан после ответа (фоновая задача), старый пароль подходит
+    await db_session.refresh(seller)
+    assert seller.password.startswith(b"$2b$05$")
+    assert auth_utils.validate_password("test", seller.password)
+
+    # С тем же cost больше не пересчитывается
+    hashed_password = seller.password
+    response = await async_client.post("/api/v1/jwt/login", data=data)
+    assert response.status_code == status.HTTP_200_OK
+    await db_session.refresh(seller)
+    assert seller.password == hashed_password
+
+
+# Тест кеша продавцов, проверенных по токену
+@pytest.mark.asyncio
+async def test_seller_identity_cached_until_seller_changes(
+    db_session, async_client, monkeypatch
+):
+    """
+    Seller from token is looked up in DB once, update and delete of the seller drop the cache
+    """
+    from src.routers.v1.jwt_routers.utils import utils_jwt
+
+    await db_session.execute(delete(sellers_jwt.SellerJWT))
+
+    seller = sellers_jwt.SellerJWT(
+        email="martiniden@gmail.com",
+        password=auth_utils.hash_password("test"),
+        first_name="Martin",
+        second_name="Iden",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    lookups = []
+    load_row_json = utils_jwt.load_row_json
+
+    async def counting_load_row_json(session, columns, row_id):
+        lookups.append(row_id)
+        return await load_row_json(session, columns, row_id)
+
+    monkeypatch.setattr(utils_jwt, "load_row_json", counting_load_row_json)
+
+    token = auth_utils.encode_jwt(payload={"email": seller.email, "seller_id": seller.id})
+    headers = {"Authorization": "Bearer " + token}
+    data = {"title": "Wrong Code", "author": "Robert Martin", "count_pages": 104, "year": 2007}
+
+    for _ in range(3):
+        response = await async_client.post(
+            "/api/v1/jwt/sellers/me/books/add", data=data, headers=headers
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()["seller_id"] == seller.id
+    assert lookups == [seller.id]
+
+    response = await async_client.put(
+        "/api/v1/jwt/sellers/me/info/update", data={"first_name": "Mark"}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = await async_client.post(
+        "/api/v1/jwt/sellers/me/books/add", data=data, headers=headers
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert lookups == [seller.id, seller.id]
+
+    response = await async_client.delete(
+        "/api/v1/jwt/sellers/me/delete_account", headers=headers
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    await db_session.flush()  # в приложении удаление записывает commit
+    response = await async_client.post(
+        "/api/v1/jwt/sellers/me/books/add", data=data, headers=headers
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # Продавца удалили мимо кеша (другой воркер с кешем в памяти): проверка токена
+    # еще в кеше, но книга не создается, и клиент получает 401, а не 500
+    seller = sellers_jwt.SellerJWT(
+        email="martiniden@gmail.com",
+        password=auth_utils.hash_password("test"),
+        first_name="Martin",
+        second_name="Iden",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    token = auth_utils.encode_jwt(payload={"email": seller.email, "seller_id": seller.id})
+    headers = {"Authorization": "Bearer " + token}
+    response = await async_client.post(
+        "/api/v1/jwt/sellers/me/books/add", data=data, headers=headers
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    await db_session.delete(seller)
+    await db_session.flush()
+    response = await async_client.post(
+        "/api/v1/jwt/sellers/me/books/add", data=data, headers=headers
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# Тест доверенного вывода: тот же ответ, что и после валидации по response_model
+@pytest.mark.asyncio
+async def test_trusted_output_matches_response_model(db_session, async_client, monkeypatch):
+    from src.configurations.settings import settings
+
+    await db_session.execute(delete(sellers_jwt.SellerJWT))
+
+    seller = sellers_jwt.SellerJWT(
+        email="martiniden@gmail.com",
+        password=auth_utils.hash_password("test"),
+        first_name="Martin",
+        second_name="Iden",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+    db_session.add(
+        books_jwt.BookJWT(
+            seller_id=seller.id,
+            title="Eat Frog",
+            author="Brian Tracy",
+            year=2020,
+            count_pages=99,
+        )
+    )
+    await db_session.flush()
+
+    token = auth_utils.encode_jwt(payload={"email": seller.email, "seller_id": seller.id})
+    headers = {"Authorization": "Bearer " + token}
+
+    responses = []
+    for trusted_output in (True, False):
+        monkeypatch.setattr(settings, "trusted_output", trusted_output)
+        response = await async_client.get("/api/v1/jwt/sellers/me/info", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        responses.append(response.content)
+
+    assert responses[0] == responses[1]
+    assert b"password" not in responses[0]
+
+
+# Доверенный вывод не пишет null вместо поля, которого нет у объекта
+def test_trusted_output_rejects_missing_fields():
+    from src.routers.v1.utils.trusted_output import serializer_for
+    from src.schemas import ReturnedAllBooks
+
+    serialize = serializer_for(ReturnedAllBooks)
+    # У необязательного поля - значение по умолчанию, как при валидации
+    assert serialize({"books": []}) == b'{"books":[],"next_cursor":null}'
+
+    book = {"id": 1, "seller_id": 1, "author": "Brian Tracy", "year": 2020, "count_pages": 99}
+    with pytest.raises(ValueError, match="title"):
+        serialize({"books": [book]})
+
+
+# Тест ответов и тела запроса в msgpack
+@pytest.mark.asyncio
+async def test_books_msgpack(db_session, async_client):
+    msgpack = pytest.importorskip("msgpack")
+
+    await db_session.execute(delete(sellers_jwt.SellerJWT))
+
+    seller = sellers_jwt.SellerJWT(
+        email="martiniden@gmail.com",
+        password=auth_utils.hash_password("test"),
+        first_name="Martin",
+        second_name="Iden",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    token = auth_utils.encode_jwt(payload={"email": seller.email, "seller_id": seller.id})
+    books = [
+        {"title": "Eat Frog", "author": "Brian Tracy", "year": 2020, "count_pages": 99},
+        {"title": "Clean Code", "author": "Robert Martin", "year": 1800, "count_pages": 464},
+    ]
+    response = await async_client.post(
+        "/api/v1/jwt/sellers/me/books/add_bulk",
+        content=msgpack.packb(books),
+        headers={"Authorization": "Bearer " + token, "Content-Type": "application/msgpack"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert len(response.json()["books"]) == 1
+    assert response.json()["errors"][0]["index"] == 1
+
+    json_response = await async_client.get("/api/v1/jwt/books/list")
+    msgpack_response = await async_client.get(
+        "/api/v1/jwt/books/list",
+        headers={"Accept": "application/msgpack, application/json;q=0.5"},
+    )
+    assert json_response.headers["content-type"] == "application/json"
+    assert msgpack_response.headers["content-type"] == "application/msgpack"
+    assert msgpack_response.headers["vary"] == "Accept"
+    assert msgpack.unpackb(msgpack_response.content) == json_response.json()
+    # Разные представления - разные ETag
+    assert msgpack_response.headers["etag"] != json_response.headers["etag"]
+
+    # */* и JSON с большим q - по-прежнему JSON
+    response = await async_client.get(
+        "/api/v1/jwt/books/list", headers={"Accept": "application/msgpack;q=0.1, */*"}
+    )
+    assert response.headers["content-type"] == "application/json"
+
+    response = await async_client.post(
+        "/api/v1/jwt/sellers/me/books/add_bulk",
+        content=b"\xc1",
+        headers={"Authorization": "Bearer " + token, "Content-Type": "application/msgpack"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# Тест параметра fields у списка и выгрузки книг
+@pytest.mark.asyncio
+async def test_books_jwt_sparse_fields(db_session, async_client):
+    await db_session.execute(delete(sellers_jwt.SellerJWT))
+
+    seller = sellers_jwt.SellerJWT(
+        email="martiniden@gmail.com",
+        password=auth_utils.hash_password("test"),
+        first_name="Martin",
+        second_name="Iden",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = books_jwt.BookJWT(
+        author="Pushkin", title="Eugeny Onegin", year=2001, count_pages=104, seller_id=seller.id
+    )
+    db_session.add(book)
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/jwt/books/list?fields=id,title")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "books": [{"id": book.id, "title": "Eugeny Onegin"}],
+        "next_cursor": None,
+    }
+
+    response = await async_client.get("/api/v1/jwt/books/export?fields=author")
+    assert response.text == f'{{"id":{book.id},"author":"Pushkin"}}\n'
+
+    response = await async_client.get("/api/v1/jwt/sellers/list?fields=nickname")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,139 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import exc, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.configurations.settings import settings
+from src.migrations import (
+    HEAD_VERSION,
+    SchemaVersionError,
+    check_schema_version,
+    get_current_version,
+    upgrade,
+)
+from src.models.base import BaseModel
+
+TEST_SCHEMA = "migrations_test"
+
+
+# Миграции гоняем в отдельной схеме, чтобы не трогать таблицы остальных тестов
+@pytest_asyncio.fixture(scope="function")
+async def migrations_engine():
+    engine = create_async_engine(
+        settings.database_test_url,
+        connect_args={"server_settings": {"search_path": TEST_SCHEMA}},
+    )
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {TEST_SCHEMA}"))
+
+    yield engine
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE"))
+    await engine.dispose()
+
+
+def _describe_schema(sync_conn, schema: str | None) -> dict:
+    inspector = inspect(sync_conn)
+    res = {}
+    for table in BaseModel.metadata.sorted_tables:
+        res[table.name] = {
+            "columns": [
+                (col["name"], col["nullable"])
+                for col in inspector.get_columns(table.name, schema=schema)
+            ],
+            "indexes": sorted(
+                (idx["name"], idx["unique"])
+                for idx in inspector.get_indexes(table.name, schema=schema)
+            ),
+        }
+    return res
+
+
+@pytest.mark.asyncio
+async def test_upgrade_builds_models_schema(migrations_engine):
+    """
+    Migrations on empty DB build the same schema as the models
+    """
+    with pytest.raises(SchemaVersionError):
+        await check_schema_version(migrations_engine)
+
+    assert await upgrade(migrations_engine) == list(range(1, HEAD_VERSION + 1))
+    assert await get_current_version(migrations_engine) == HEAD_VERSION
+    assert await check_schema_version(migrations_engine) == HEAD_VERSION
+
+    # Повторный запуск ничего не делает
+    assert await upgrade(migrations_engine) == []
+
+    async with migrations_engine.connect() as conn:
+        migrated = await conn.run_sync(_describe_schema, TEST_SCHEMA)
+        # Тестовые таблицы в схеме public создает create_all из моделей
+        expected = await conn.run_sync(_describe_schema, "public")
+
+    assert migrated == expected
+
+
+@pytest.mark.asyncio
+async def test_upgrade_adopts_existing_tables(migrations_engine):
+    """
+    DB created by create_all() without indexes is adopted and gets the indexes
+    """
+    async with migrations_engine.begin() as conn:
+        await conn.run_sync(BaseModel.metadata.create_all)
+        await conn.execute(text("DROP INDEX ix_books_table_seller_id"))
+
+    assert await upgrade(migrations_engine) == list(range(1, HEAD_VERSION + 1))
+
+    async with migrations_engine.connect() as conn:
+        res = await conn.execute(
+            text(
+                "SELECT count(*) FROM pg_indexes "
+                "WHERE schemaname = :schema AND indexname = 'ix_books_table_seller_id'"
+            ),
+            {"schema": TEST_SCHEMA},
+        )
+        assert res.scalar() == 1
+
+
+@pytest.mark.asyncio
+async def test_upgrade_rebuilds_invalid_index(migrations_engine):
+    """
+    Index left INVALID by a failed concurrent build is dropped and built again
+    """
+    async with migrations_engine.begin() as conn:
+        await conn.run_sync(BaseModel.metadata.create_all)
+        await conn.execute(text("DROP INDEX ix_sellers_jwt_table_email"))
+        await conn.execute(
+            text(
+                "INSERT INTO sellers_jwt_table (id, first_name, second_name, email, password) "
+                "VALUES (1, 'a', 'b', 'x@y.com', ''), (2, 'c', 'd', 'x@y.com', '')"
+            )
+        )
+
+    # Из-за дубликата построение падает и оставляет индекс INVALID
+    async with migrations_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        with pytest.raises(exc.IntegrityError):
+            await conn.execute(
+                text(
+                    "CREATE UNIQUE INDEX CONCURRENTLY ix_sellers_jwt_table_email "
+                    "ON sellers_jwt_table (email)"
+                )
+            )
+
+    async with migrations_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM sellers_jwt_table WHERE id = 2"))
+
+    assert await upgrade(migrations_engine) == list(range(1, HEAD_VERSION + 1))
+
+    async with migrations_engine.connect() as conn:
+        res = await conn.execute(
+            text(
+                "SELECT i.indisvalid AND i.indisunique FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = 'ix_sellers_jwt_table_email' AND pg_table_is_visible(c.oid)"
+            )
+        )
+        assert res.scalar() is True
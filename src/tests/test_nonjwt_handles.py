@@ -1,7 +1,10 @@
+import orjson
 import pytest
 from fastapi import status
-from sqlalchemy import select, delete
+from sqlalchemy import delete, select
 
+from src.configurations.cache import response_cache
+from src.configurations.settings import settings
 from src.models import books
 from src.models import sellers
 
@@ -120,7 +123,8 @@ async def test_get_sellers(db_session, async_client):
                 "second_name": "Pythonovich",
                 "email": "zenpythonovich@gmail.com",
             },
-        ]
+        ],
+        "next_cursor": None,
     }
 
 
@@ -270,6 +274,172 @@ async def test_get_seller_info(db_session, async_client):
         ],
     }
 
+    etag = response.headers["etag"]
+    response = await async_client.get(
+        f"/api/v1/nonjwt/sellers/{seller_1.id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["cache-control"] == "no-cache"
+
+    response = await async_client.get(
+        f"/api/v1/nonjwt/sellers/{seller_1.id + 100}", headers={"If-None-Match": "*"}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Продавец с книгами читается одним запросом
+@pytest.mark.asyncio
+async def test_get_seller_info_single_query(db_session, async_client, record_statements):
+    """
+    Get seller info with one SQL statement, seller without books has empty list
+    """
+
+    await db_session.execute(delete(sellers.Seller))
+
+    seller_1 = sellers.Seller(
+        email="martinidenza@gmail.com",
+        password="test00",
+        first_name="Martin",
+        second_name="Idenza",
+    )
+    db_session.add(seller_1)
+    await db_session.flush()
+
+    with record_statements() as statements:
+        response = await async_client.get(f"/api/v1/nonjwt/sellers/{seller_1.id}")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(statements) == 1
+    assert response.json() == {
+        "id": seller_1.id,
+        "first_name": "Martin",
+        "second_name": "Idenza",
+        "email": "martinidenza@gmail.com",
+        "books": [],
+    }
+
+    response = await async_client.get(f"/api/v1/nonjwt/sellers/{seller_1.id + 1}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Массово создаем книги. Ошибочные книги не мешают создать остальные
+@pytest.mark.asyncio
+async def test_create_books_bulk(db_session, async_client):
+    """
+    Create list of books, invalid ones are reported by index
+    """
+
+    await db_session.execute(delete(sellers.Seller))
+
+    seller = sellers.Seller(
+        email="martinidenza@gmail.com",
+        password="test00",
+        first_name="Martin",
+        second_name="Idenza",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    data = [
+        {"title": "Wrong Code", "author": "Robert Martin", "pages": 104, "year": 2007},
+        {"title": "Old Code", "author": "Robert Martin", "pages": 104, "year": 1800},
+        {"title": "Clean Code", "author": "Robert Martin", "pages": 104, "year": 2007},
+        {"title": "Lost Code", "author": "Robert Martin", "pages": 104, "year": 2007},
+    ]
+    for book in data:
+        book["seller_id"] = seller.id
+    data[3]["seller_id"] = seller.id + 100
+
+    response = await async_client.post("/api/v1/nonjwt/books/bulk", json=data)
+    result_data = response.json()
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert [book["title"] for book in result_data["books"]] == ["Wrong Code", "Clean Code"]
+    assert result_data["books"][0] == {
+        "id": result_data["books"][0]["id"],
+        "seller_id": seller.id,
+        "title": "Wrong Code",
+        "author": "Robert Martin",
+        "year": 2007,
+        "count_pages": 104,
+    }
+    assert [error["index"] for error in result_data["errors"]] == [1, 3]
+    assert result_data["errors"][0]["detail"][0]["loc"] == ["year"]
+    assert result_data["errors"][1]["detail"][0]["loc"] == ["seller_id"]
+
+    all_books = await db_session.execute(select(books.Book))
+    assert len(all_books.scalars().all()) == 2
+
+
+# Импортируем книги из CSV через COPY
+@pytest.mark.asyncio
+async def test_import_books_csv(db_session, async_client):
+    """
+    Import books from CSV, invalid rows are reported by line number
+    """
+
+    await db_session.execute(delete(sellers.Seller))
+
+    seller = sellers.Seller(
+        email="martinidenza@gmail.com",
+        password="test00",
+        first_name="Martin",
+        second_name="Idenza",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    csv_data = (
+        "seller_id,title,author,year,pages\n"
+        f"{seller.id},Clean Code,Robert Martin,2007,104\n"
+        f'{seller.id},"Code, Complete",Steve McConnell,2004,900\n'
+        f"{seller.id},Old Code,Robert Martin,1800,104\n"
+        f"{seller.id + 100},Lost Code,Robert Martin,2007,104\n"
+        # Проходит валидацию, но не влезает в INTEGER: БД отвергает только эту строку
+        f"{seller.id},Huge Code,Robert Martin,2007,99999999999\n"
+        f"{seller.id},Clean Architecture,Robert Martin,2017,432\n"
+    )
+    response = await async_client.post(
+        "/api/v1/nonjwt/books/import",
+        files={"file": ("books.csv", csv_data.encode(), "text/csv")},
+    )
+    result_data = response.json()
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert result_data["rows_total"] == 6
+    assert result_data["rows_imported"] == 3
+    assert result_data["rows_rejected"] == 3
+    assert [error["line"] for error in result_data["errors"]] == [4, 5, 6]
+    assert result_data["errors"][2]["detail"][0]["type"] == "db_error"
+    assert result_data["peak_memory_bytes"] >= 0
+    assert result_data["rows_per_second"] == pytest.approx(3 / result_data["elapsed_seconds"])
+
+    all_books = await db_session.execute(select(books.Book).order_by(books.Book.id))
+    assert [(b.title, b.count_pages) for b in all_books.scalars().all()] == [
+        ("Clean Code", 104),
+        ("Code, Complete", 900),
+        ("Clean Architecture", 432),
+    ]
+
+    response = await async_client.post(
+        "/api/v1/nonjwt/books/import",
+        files={"file": ("books.csv", b"title,author\nClean Code,Robert Martin\n", "text/csv")},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    # Файл не в UTF-8 и поле больше лимита модуля csv: 422 с номером строки, а не 500
+    header = "seller_id,title,author,year,pages\n"
+    row = f"{seller.id},Clean Code,Robert Martin,2007,104\n"
+    for data, line in (
+        ((header + row + f"{seller.id},Café,Author,2007,104\n").encode("latin-1"), 3),
+        ((header + row + f"{seller.id},{'x' * 200_000},A,2007,104\n").encode(), 3),
+    ):
+        response = await async_client.post(
+            "/api/v1/nonjwt/books/import", files={"file": ("books.csv", data, "text/csv")}
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert f"CSV line {line} " in response.json()["detail"]
+
 
 # Получить cписок всех книг
 @pytest.mark.asyncio
@@ -331,9 +501,117 @@ async def test_get_all_books(db_session, async_client):
                 "count_pages": 104,
             },
         ],
+        "next_cursor": None,
     }
 
 
+# Получить cписок книг постранично
+@pytest.mark.asyncio
+async def test_get_all_books_paginated(db_session, async_client):
+    """
+    Get list of books page by page using next_cursor
+    """
+
+    await db_session.execute(delete(sellers.Seller))
+
+    seller_1 = sellers.Seller(
+        email="martinidenza@gmail.com",
+        password="test00",
+        first_name="Martin",
+        second_name="Idenza",
+    )
+
+    db_session.add(seller_1)
+    await db_session.flush()
+
+    test_books = [
+        books.Book(
+            seller_id=seller_1.id,
+            title=f"Clean Code vol. {i}",
+            author="Robert Martin",
+            count_pages=104,
+            year=2007,
+        )
+        for i in range(5)
+    ]
+
+    db_session.add_all(test_books)
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/nonjwt/books/", params={"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    result_data = response.json()
+    assert [book["id"] for book in result_data["books"]] == [b.id for b in test_books[:2]]
+    assert result_data["next_cursor"] == test_books[1].id
+
+    response = await async_client.get(
+        "/api/v1/nonjwt/books/", params={"limit": 2, "after": result_data["next_cursor"]}
+    )
+    result_data = response.json()
+    assert [book["id"] for book in result_data["books"]] == [b.id for b in test_books[2:4]]
+    assert result_data["next_cursor"] == test_books[3].id
+
+    response = await async_client.get(
+        "/api/v1/nonjwt/books/", params={"limit": 2, "after": result_data["next_cursor"]}
+    )
+    result_data = response.json()
+    assert [book["id"] for book in result_data["books"]] == [test_books[4].id]
+    assert result_data["next_cursor"] is None
+
+    response = await async_client.get("/api/v1/nonjwt/books/", params={"limit": 0})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+# Выгрузить все книги потоком NDJSON
+@pytest.mark.asyncio
+async def test_export_books_ndjson(db_session, async_client):
+    """
+    Export all books as newline-delimited JSON
+    """
+
+    await db_session.execute(delete(sellers.Seller))
+
+    seller_1 = sellers.Seller(
+        email="martinidenza@gmail.com",
+        password="test00",
+        first_name="Martin",
+        second_name="Idenza",
+    )
+
+    db_session.add(seller_1)
+    await db_session.flush()
+
+    test_books = [
+        books.Book(
+            seller_id=seller_1.id,
+            title=f"Clean Code vol. {i}",
+            author="Robert Martin",
+            count_pages=104,
+            year=2007,
+        )
+        for i in range(3)
+    ]
+
+    db_session.add_all(test_books)
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/nonjwt/books/export")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [orjson.loads(line) for line in response.content.splitlines()] == [
+        {
+            "id": book.id,
+            "seller_id": seller_1.id,
+            "title": book.title,
+            "author": "Robert Martin",
+            "year": 2007,
+            "count_pages": 104,
+        }
+        for book in test_books
+    ]
+
+
 # Изменить книгу
 @pytest.mark.asyncio
 async def test_update_book(db_session, async_client):
@@ -515,3 +793,196 @@ async def test_delete_seller(db_session, async_client):
     all_books = await db_session.execute(select(books.Book))
     res = all_books.scalars().all()
     assert len(res) == 2
+
+
+# Ручки чтения отдают ответ из кеша, ручки записи его сбрасывают
+@pytest.mark.asyncio
+async def test_book_reads_cached_until_write(db_session, async_client, monkeypatch):
+    """
+    Book and book list are served from cache and are fresh right after update
+    """
+
+    await db_session.execute(delete(sellers.Seller))
+
+    seller = sellers.Seller(
+        email="martinidenza@gmail.com",
+        password="test00",
+        first_name="Martin",
+        second_name="Idenza",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = books.Book(
+        seller_id=seller.id,
+        title="Wrong Code",
+        author="Robert Martin",
+        count_pages=104,
+        year=2007,
+    )
+    db_session.add(book)
+    await db_session.flush()
+
+    hits, misses = response_cache.stats()["hits"], response_cache.stats()["misses"]
+    for _ in range(2):
+        response = await async_client.get(f"/api/v1/nonjwt/books/{book.id}")
+        assert response.json()["title"] == "Wrong Code"
+        response = await async_client.get("/api/v1/nonjwt/books/")
+        assert response.json()["books"][0]["title"] == "Wrong Code"
+
+    assert response_cache.stats()["hits"] == hits + 2
+    assert response_cache.stats()["misses"] == misses + 2
+
+    data = {
+        "seller_id": seller.id,
+        "title": "Clean Code",
+        "author": "Robert Martin",
+        "pages": 104,
+        "year": 2007,
+    }
+    response = await async_client.put(f"/api/v1/nonjwt/books/{book.id}", json=data)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.get(f"/api/v1/nonjwt/books/{book.id}")
+    assert response.json()["title"] == "Clean Code"
+    response = await async_client.get("/api/v1/nonjwt/books/")
+    assert response.json()["books"][0]["title"] == "Clean Code"
+
+    # Удаление продавца каскадно удаляет книги - их кеш тоже сбрасывается
+    response = await async_client.delete(f"/api/v1/nonjwt/sellers/{seller.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/nonjwt/books/")
+    assert response.json() == {"books": [], "next_cursor": None}
+
+    monkeypatch.setattr(settings, "internal_stats_token", "secret")
+    response = await async_client.get(
+        "/api/v1/internal/stats/cache", headers={"X-Internal-Token": "secret"}
+    )
+    assert response.json()["backend_stats"]["versions"]["books_table"] == 2
+
+
+# Клиент с актуальным ETag получает 304 без тела и без запроса в БД
+@pytest.mark.asyncio
+async def test_books_conditional_get(db_session, async_client, record_statements):
+    """
+    Book list has ETag, matching If-None-Match gets 304 until books are changed
+    """
+
+    await db_session.execute(delete(sellers.Seller))
+
+    seller = sellers.Seller(
+        email="martinidenza@gmail.com",
+        password="test00",
+        first_name="Martin",
+        second_name="Idenza",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/nonjwt/books/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    with record_statements() as statements:
+        response = await async_client.get(
+            "/api/v1/nonjwt/books/", headers={"If-None-Match": f'"other", W/{etag}'}
+        )
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+    assert statements == []
+
+    # ETag - хеш тела: воркер со своим (пустым) кешем отдает тот же ETag
+    await response_cache.clear()
+    response = await async_client.get("/api/v1/nonjwt/books/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # "*" совпадает только с существующей книгой
+    response = await async_client.get(
+        "/api/v1/nonjwt/books/100500", headers={"If-None-Match": "*"}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    data = {
+        "seller_id": seller.id,
+        "title": "Clean Code",
+        "author": "Robert Martin",
+        "pages": 104,
+        "year": 2007,
+    }
+    response = await async_client.post("/api/v1/nonjwt/books/", json=data)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = await async_client.get("/api/v1/nonjwt/books/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    assert len(response.json()["books"]) == 1
+
+    book_id = response.json()["books"][0]["id"]
+    response = await async_client.get(
+        f"/api/v1/nonjwt/books/{book_id}", headers={"If-None-Match": "*"}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+# С параметром fields из БД читаются и отдаются только нужные колонки
+@pytest.mark.asyncio
+async def test_books_sparse_fields(db_session, async_client, record_statements):
+    """
+    Book reads with `fields` select only listed columns (and id), unknown fields get 422
+    """
+
+    await db_session.execute(delete(sellers.Seller))
+
+    seller = sellers.Seller(
+        email="martinidenza@gmail.com",
+        password="12345678",
+        first_name="Martin",
+        second_name="Idenza",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = books.Book(
+        author="Pushkin", title="Eugeny Onegin", year=2001, count_pages=104, seller_id=seller.id
+    )
+    db_session.add(book)
+    await db_session.flush()
+
+    with record_statements() as statements:
+        response = await async_client.get("/api/v1/nonjwt/books/?fields=title, author")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "books": [{"id": book.id, "title": "Eugeny Onegin", "author": "Pushkin"}],
+        "next_cursor": None,
+    }
+    select_books = next(statement for statement in statements if "books_table" in statement)
+    assert "count_pages" not in select_books
+
+    # Полная страница кешируется отдельно от урезанной
+    response = await async_client.get("/api/v1/nonjwt/books/")
+    assert response.json()["books"][0]["count_pages"] == 104
+
+    response = await async_client.get(f"/api/v1/nonjwt/books/{book.id}?fields=year")
+    assert response.json() == {"id": book.id, "year": 2001}
+
+    response = await async_client.get("/api/v1/nonjwt/sellers/?fields=email")
+    assert response.json()["sellers"] == [{"id": seller.id, "email": "martinidenza@gmail.com"}]
+
+    response = await async_client.get("/api/v1/nonjwt/books/?fields=title,password")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert "password" in response.json()["detail"]
+
+    for fields in ("", " , "):
+        response = await async_client.get(f"/api/v1/nonjwt/books/?fields={fields}")
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    # В OpenAPI сказано, что с fields часть ключей схемы отсутствует
+    response = await async_client.get("/openapi.json")
+    ok_response = response.json()["paths"]["/api/v1/nonjwt/books/"]["get"]["responses"]["200"]
+    assert "`fields`" in ok_response["description"]
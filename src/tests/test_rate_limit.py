@@ -0,0 +1,114 @@
+import pytest
+from fastapi import status
+
+from src.configurations import rate_limit
+from src.configurations.auth import utils as auth_utils
+from src.configurations.cache_backends import RedisCacheBackend
+from src.configurations.rate_limit import (
+    MemoryRateLimitStore,
+    RateLimited,
+    RateLimiter,
+    RedisRateLimitStore,
+)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_burst_and_refill(monkeypatch):
+    """
+    Bucket lets `burst` attempts through at once, then one attempt per refill interval
+    """
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+
+    limiter = RateLimiter(MemoryRateLimitStore(max_keys=10), per_minute=6, burst=3)
+    for _ in range(3):
+        await limiter.check("a")
+
+    with pytest.raises(RateLimited) as exc_info:
+        await limiter.check("a")
+    assert exc_info.value.retry_after == pytest.approx(10)
+    await limiter.check("b")  # у другого ключа своя корзина
+
+    now[0] += 10
+    await limiter.check("a")
+    with pytest.raises(RateLimited):
+        await limiter.check("a")
+
+    # Через burst * interval корзина снова полная (и удалена из памяти)
+    now[0] += 30
+    for _ in range(3):
+        await limiter.check("a")
+
+    assert limiter.stats()["allowed"] == 8
+    assert limiter.stats()["rejected"] == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_rate_limit_shared_between_processes(fake_redis):
+    """
+    Two processes on one Redis server take tokens from the same bucket
+    (the Lua script of the store is run by an embedded Lua interpreter)
+    """
+    pytest.importorskip("lupa")
+    server, url = fake_redis
+    stores = [
+        RedisRateLimitStore(RedisCacheBackend(url, "test", pool_size=2, timeout=1))
+        for _ in range(2)
+    ]
+    limiters = [RateLimiter(store, per_minute=1, burst=2) for store in stores]
+
+    try:
+        await limiters[0].check("a")
+        await limiters[1].check("a")
+        with pytest.raises(RateLimited) as exc_info:
+            await limiters[0].check("a")
+        assert 59 < exc_info.value.retry_after <= 60
+        assert server.commands.count(b"EVAL") == 3
+        # Время берет сам скрипт, на сервере; взятые токены записаны с TTL
+        assert server.commands.count(b"TIME") == 3
+        assert server.commands.count(b"SET") == 2
+
+        # Без Redis попытки пропускаются
+        await stores[1].close()  # открытые соединения остановка сервера не закрывает
+        await server.stop()
+        await limiters[1].check("a")
+        assert limiters[1].stats()["errors"] == 1
+    finally:
+        for store in stores:
+            await store.close()
+
+
+@pytest.mark.asyncio
+async def test_login_rate_limited_before_db_and_bcrypt(async_client, monkeypatch):
+    """
+    Unknown email gets 401 (same bcrypt work as a known one), attempts over the email limit
+    get 429 with Retry-After and cost no password check
+    """
+    limiter = RateLimiter(rate_limit.rate_limit_store, per_minute=1, burst=2)
+    monkeypatch.setattr(
+        "src.routers.v1.jwt_routers.utils.utils_jwt.email_rate_limiter", limiter
+    )
+
+    verified = []
+    verify = auth_utils.password_hasher.verify
+
+    async def counting_verify(*args, **kwargs):
+        verified.append(args)
+        return await verify(*args, **kwargs)
+
+    monkeypatch.setattr(auth_utils.password_hasher, "verify", counting_verify)
+
+    data = {"email": "nobody@example.com", "password": "password"}
+    for _ in range(2):
+        response = await async_client.post("/api/v1/jwt/login", data=data)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert len(verified) == 2
+
+    response = await async_client.post("/api/v1/jwt/login", data=data)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert 0 < int(response.headers["Retry-After"]) <= 60
+    assert len(verified) == 2
+
+    # Регистрация с тем же email делит с входом ту же корзину
+    response = await async_client.post("/api/v1/jwt/signup", data=data)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS